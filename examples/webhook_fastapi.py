@@ -4,32 +4,40 @@ Webhook Bot with FastAPI - Shingram Example
 A bot that uses webhooks with FastAPI for production deployment.
 """
 
+from contextlib import asynccontextmanager
 from shingram import Bot
 from fastapi import FastAPI, Request
 
 bot = Bot("YOUR_BOT_TOKEN")
-app = FastAPI()
-# Handler receives (body, headers); call it from your webhook route
-handler = bot.create_webhook_handler(secret_token="your_secret")
+# Async handler receives (body, headers); background=True answers Telegram before handlers finish
+handler = bot.create_async_webhook_handler(secret_token="your_secret", background=True)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # On shutdown: let background handlers finish, then close the HTTP clients
+    await handler.close_async()
+    await bot.close_async()
+
+app = FastAPI(lifespan=lifespan)
 
 @bot.on("command:start")
-def handle_start(event):
-    bot.send_message(
+async def handle_start(event):
+    await bot.async_client.send_message(
         chat_id=event.chat_id,
         text="Hey! I'm using shingram\n\nWebhook bot is running!"
     )
 
 @bot.on("message")
-def handle_message(event):
-    bot.send_message(
+async def handle_message(event):
+    await bot.async_client.send_message(
         chat_id=event.chat_id,
         text=f"Hey! I'm using shingram\n\nYou said: {event.text}"
     )
 
 @app.post('/webhook')
 async def webhook(request: Request):
-    body = await request.body()
-    handler(body.decode('utf-8'), dict(request.headers))
+    await handler(await request.body(), request.headers)
     return {"status": "ok"}
 
 if __name__ == "__main__":
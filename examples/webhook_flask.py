@@ -28,7 +28,7 @@ def handle_message(event):
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
-    handler(request.data.decode('utf-8'), dict(request.headers))
+    handler(request.data, dict(request.headers))
     return 'OK'
 
 if __name__ == "__main__":
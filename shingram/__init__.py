@@ -1,15 +1,39 @@
 """Shingram - A minimal Telegram bot API wrapper."""
 
 from .bot import Bot
+from .client import HTTPOptions, RetryPolicy
+from .files import InputFile, FileIdCache
 from .exceptions import ShingramError, TelegramAPIError, EventError
-from .webhook import WebhookServer, create_webhook_handler
+from .ratelimit import RateLimiter
+from .broadcast import BroadcastResult
+from .outbox import SendQueue, AsyncSendQueue
+from .state import StateStore, SQLiteStateBackend, FileStateBackend
+from .throttle import Throttle, ThrottleRule
+from .dedup import UpdateDeduplicator, SQLiteSeenStore
+from .webhook import WebhookServer, create_webhook_handler, create_async_webhook_handler
 
 __all__ = [
     "Bot",
+    "HTTPOptions",
+    "RetryPolicy",
+    "InputFile",
+    "FileIdCache",
     "ShingramError",
     "TelegramAPIError",
     "EventError",
+    "RateLimiter",
+    "BroadcastResult",
+    "SendQueue",
+    "AsyncSendQueue",
+    "StateStore",
+    "SQLiteStateBackend",
+    "FileStateBackend",
+    "Throttle",
+    "ThrottleRule",
+    "UpdateDeduplicator",
+    "SQLiteSeenStore",
     "WebhookServer",
     "create_webhook_handler",
+    "create_async_webhook_handler",
 ]
 __version__ = "0.3.0"
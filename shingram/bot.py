@@ -1,26 +1,72 @@
 """Bot API: one Router, sync and async clients share the same handlers and Event model."""
 
 import asyncio
-from typing import Callable, List, Optional
-from .client import Client, AsyncClient
+from functools import partial
+from typing import Callable, Iterable, List, Optional, Pattern, Union
+from .client import Client, AsyncClient, HTTPOptions, RetryPolicy
+from .dedup import UpdateDeduplicator
+from .files import FileIdCache
+from .ratelimit import RateLimiter
 from .router import Router
+from .state import StateStore
+from .throttle import Throttle
 from .runtime import Runtime, AsyncRuntime
-from .webhook import WebhookServer, create_webhook_handler
+from .webhook import WebhookServer, create_webhook_handler, create_async_webhook_handler
 
 
 class Bot:
     """Single bot instance: run() uses sync client, run_async() uses async_client; both use the same router."""
 
-    def __init__(self, token: str):
-        self.client = Client(token)
-        self.async_client = AsyncClient(token)
-        self.router = Router()
-        self.runtime = Runtime(self.client, self.router)
+    def __init__(
+        self,
+        token: str,
+        rate_limiter: Optional[RateLimiter] = None,
+        http: Optional[HTTPOptions] = None,
+        file_ids: Optional[FileIdCache] = None,
+        retry: Optional[RetryPolicy] = None,
+        states: Optional[StateStore] = None,
+    ):
+        """rate_limiter: optional RateLimiter shared by both clients to pace sends and honor 429 retry_after.
+        http: optional HTTPOptions (pool size, keep-alive, HTTP/2, timeouts) for both clients.
+        file_ids: optional FileIdCache (e.g. FileIdCache(store="file_ids.db")) for uploaded media.
+        retry: optional RetryPolicy (backoff, circuit breaker) shared by both clients and the polling loops.
+        states: optional StateStore for conversation state (e.g. StateStore(ttl=3600, backend="states.db")).
+        """
+        file_ids = file_ids if file_ids is not None else FileIdCache()
+        retry = retry if retry is not None else RetryPolicy()
+        self.client = Client(token, rate_limiter, http, file_ids, retry)
+        self.async_client = AsyncClient(token, rate_limiter, http, file_ids, retry)
+        self.router = Router(states)
+        self.runtime = Runtime(self.client, self.router, retry)
         self._webhook_server = None
 
-    def on(self, event_name: str, handler: Optional[Callable] = None):
-        """Register handler; decorator or bot.on(name, fn)."""
-        return self.router.on(event_name, handler)
+    def on(
+        self,
+        event_name: str,
+        handler: Optional[Callable] = None,
+        *,
+        prefix: str = "",
+        regex: Union[str, Pattern, None] = None,
+        predicate: Optional[Callable] = None,
+        state: Optional[str] = None,
+    ):
+        """Register handler; decorator or bot.on(name, fn). Optional filters: prefix, regex, predicate, state (see Router)."""
+        return self.router.on(event_name, handler, prefix=prefix, regex=regex, predicate=predicate, state=state)
+
+    def use(self, middleware: Callable):
+        """Add middleware(event, call_next) around dispatch; usable as a decorator (see Router.use)."""
+        return self.router.use(middleware)
+
+    @property
+    def states(self) -> StateStore:
+        """Conversation state per chat and user: bot.states.set(event, "ask_name"), bot.states.get(event)."""
+        if self.router.states is None:
+            self.router.states = StateStore()
+        return self.router.states
+
+    def _flush_states(self):
+        if self.router.states is not None:
+            self.router.states.flush()
 
     def run(
         self,
@@ -28,14 +74,33 @@ class Bot:
         limit: int = 100,
         allowed_updates: Optional[List[str]] = None,
         on_error: Optional[Callable[[BaseException], None]] = None,
+        workers: Optional[int] = None,
+        queue_size: int = 100,
+        prefetch: int = 0,
+        throttle: Optional[Throttle] = None,
+        dedup: Optional[UpdateDeduplicator] = None,
     ):
-        """Long-polling loop (sync). Optional: timeout, limit, allowed_updates, on_error callback."""
-        self.runtime.run(
-            timeout=timeout,
-            limit=limit,
-            allowed_updates=allowed_updates,
-            on_error=on_error,
-        )
+        """Long-polling loop (sync). Optional: timeout, limit, allowed_updates, on_error callback.
+
+        workers=N runs handlers on N threads while polling continues; updates from the same chat stay in order.
+        prefetch=N fetches the next batch while the current one is dispatched (up to N batches buffered).
+        throttle=Throttle(...) drops, delays or collapses floods from single users before dispatch.
+        dedup=UpdateDeduplicator(store="seen.db") skips updates a previous run already handled, after a restart.
+        """
+        try:
+            self.runtime.run(
+                timeout=timeout,
+                limit=limit,
+                allowed_updates=allowed_updates,
+                on_error=on_error,
+                workers=workers,
+                queue_size=queue_size,
+                prefetch=prefetch,
+                throttle=throttle,
+                dedup=dedup,
+            )
+        finally:
+            self._flush_states()
 
     def run_async(
         self,
@@ -43,17 +108,54 @@ class Bot:
         limit: int = 100,
         allowed_updates: Optional[List[str]] = None,
         on_error: Optional[Callable[[BaseException], None]] = None,
+        concurrency: Optional[int] = None,
+        prefetch: int = 0,
+        throttle: Optional[Throttle] = None,
+        dedup: Optional[UpdateDeduplicator] = None,
     ):
-        """Long-polling loop (async). Handlers can be async; use await bot.async_client.send_message(...) etc."""
+        """Long-polling loop (async). Handlers can be async; use await bot.async_client.send_message(...) etc.
+
+        concurrency=N runs up to N updates at once as tasks; updates from the same chat stay in order.
+        prefetch=N fetches the next batch while the current one is dispatched (up to N batches buffered).
+        """
         async def _run():
-            runtime = AsyncRuntime(self.async_client, self.router)
+            runtime = AsyncRuntime(self.async_client, self.router, self.async_client.retry)
             await runtime.run_async(
                 timeout=timeout,
                 limit=limit,
                 allowed_updates=allowed_updates,
                 on_error=on_error,
+                concurrency=concurrency,
+                prefetch=prefetch,
+                throttle=throttle,
+                dedup=dedup,
             )
-        asyncio.run(_run())
+        try:
+            asyncio.run(_run())
+        finally:
+            self._flush_states()
+
+    def broadcast(
+        self,
+        chat_ids: Iterable,
+        method: str = "sendMessage",
+        concurrency: int = 20,
+        checkpoint: Optional[str] = None,
+        **params,
+    ):
+        """Send one message to many chats (sync client, thread pool); yields per-chat BroadcastResults.
+
+        For async use: async for r in bot.async_client.broadcast(...). checkpoint=path makes reruns skip finished chats.
+        """
+        return self.client.broadcast(chat_ids, method, concurrency, checkpoint, **params)
+
+    @property
+    def enqueue(self):
+        """Fire-and-forget sends: bot.enqueue.send_message(...) returns a Future at once; same-chat sends stay in order.
+
+        Runs on background threads with the sync client; in async handlers use bot.async_client.enqueue.
+        """
+        return self.client.enqueue
 
     def set_webhook(self, url: str, secret_token: Optional[str] = None, **kwargs):
         params = {"url": url}
@@ -68,9 +170,35 @@ class Bot:
     def get_webhook_info(self):
         return self.client.call("getWebhookInfo")
 
-    def create_webhook_handler(self, secret_token: Optional[str] = None):
-        """Returns a (body, headers) -> bool handler for Flask/FastAPI etc."""
-        return create_webhook_handler(self.router, secret_token)
+    def create_webhook_handler(
+        self,
+        secret_token: Optional[str] = None,
+        processes: Optional[int] = None,
+        dedup: Optional[UpdateDeduplicator] = None,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
+        """Returns a (body, headers) -> bool handler for Flask/FastAPI etc.; processes=N dispatches in N worker processes.
+
+        dedup=UpdateDeduplicator(...) acknowledges updates Telegram redelivers without dispatching them again.
+        Call handler.close() at shutdown so worker processes finish the updates already queued.
+        initializer() runs once in each worker process before it handles updates.
+        """
+        return create_webhook_handler(self.router, secret_token, processes, dedup, initializer)
+
+    def create_async_webhook_handler(
+        self,
+        secret_token: Optional[str] = None,
+        background: bool = False,
+        concurrency: int = 100,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        dedup: Optional[UpdateDeduplicator] = None,
+    ):
+        """Returns an async (body, headers) -> bool handler for FastAPI etc.; dispatches with dispatch_async.
+
+        background=True returns once the update is scheduled, so the HTTP 200 isn't held up by slow handlers.
+        On shutdown, await handler.close_async() so background handlers finish.
+        """
+        return create_async_webhook_handler(self.router, secret_token, background, concurrency, on_error, dedup)
 
     def handle_webhook_update(self, update_json: dict, headers: Optional[dict] = None, secret_token: Optional[str] = None):
         if not self._webhook_server:
@@ -78,12 +206,14 @@ class Bot:
         return self._webhook_server.handle_update(update_json, headers)
 
     def close(self):
-        """Close the sync HTTP client."""
+        """Close the sync HTTP client and flush conversation state."""
         self.client.close()
+        self._flush_states()
 
     async def close_async(self):
-        """Close both sync and async HTTP clients."""
+        """Close both sync and async HTTP clients and flush conversation state."""
         self.client.close()
+        self._flush_states()
         await self.async_client.close()
 
     def __enter__(self):
@@ -99,4 +229,8 @@ class Bot:
         await self.close_async()
 
     def __getattr__(self, name: str):
-        return getattr(self.client, name)
+        value = getattr(self.client, name)
+        if isinstance(value, partial):
+            # API method proxy: memoize so bot.send_message is a plain attribute hit after first use.
+            self.__dict__[name] = value
+        return value
@@ -0,0 +1,149 @@
+"""Broadcast one message to many chats: bounded concurrency, per-chat results, resumable via a checkpoint file."""
+
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Union
+from .exceptions import TelegramAPIError
+from .ratelimit import RateLimiter
+
+ChatId = Union[int, str]
+_PERMANENT = (400, 403)
+
+
+@dataclass
+class BroadcastResult:
+    """Outcome for one chat: the API result, or the error that stopped it."""
+    chat_id: ChatId
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _Checkpoint:
+    """Append-only file of finished chat ids; a rerun with the same file skips them."""
+
+    def __init__(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            self.done = set()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, chat_id: ChatId) -> bool:
+        return str(chat_id) in self.done
+
+    def record(self, outcome: BroadcastResult):
+        # Only successes and errors a retry can't fix (bad request, blocked bot) are final; network
+        # failures, 429s and 5xx are left out so a resumed run tries those chats again.
+        if outcome.ok or (isinstance(outcome.error, TelegramAPIError) and outcome.error.error_code in _PERMANENT):
+            self._file.write(f"{outcome.chat_id}\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _send_one(send: Callable, chat_id: ChatId) -> BroadcastResult:
+    try:
+        return BroadcastResult(chat_id, result=send(chat_id))
+    except Exception as e:
+        return BroadcastResult(chat_id, error=e)
+
+
+async def _send_one_async(send: Callable, chat_id: ChatId) -> BroadcastResult:
+    try:
+        return BroadcastResult(chat_id, result=await send(chat_id))
+    except Exception as e:
+        return BroadcastResult(chat_id, error=e)
+
+
+def broadcast(
+    client,
+    chat_ids: Iterable[ChatId],
+    method: str = "sendMessage",
+    concurrency: int = 20,
+    checkpoint: Optional[str] = None,
+    **params,
+) -> Iterator[BroadcastResult]:
+    """Call `method` with chat_id=... for each chat on a thread pool; yields results as they finish.
+
+    Sends are paced by the client's RateLimiter, or by a default one if the client has none.
+    With checkpoint=path, finished chats are appended to that file and skipped when rerun.
+    """
+    if client.rate_limiter is None:
+        limiter = RateLimiter()
+        send = lambda chat_id: limiter.call(chat_id, lambda: client.call(method, chat_id=chat_id, **params))
+    else:
+        send = lambda chat_id: client.call(method, chat_id=chat_id, **params)
+    done = _Checkpoint(checkpoint) if checkpoint else None
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="shingram-broadcast") as pool:
+            pending = set()
+            for chat_id in chat_ids:
+                if done is not None and chat_id in done:
+                    continue
+                if len(pending) >= concurrency:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        outcome = future.result()
+                        if done is not None:
+                            done.record(outcome)
+                        yield outcome
+                pending.add(pool.submit(_send_one, send, chat_id))
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    outcome = future.result()
+                    if done is not None:
+                        done.record(outcome)
+                    yield outcome
+    finally:
+        if done is not None:
+            done.close()
+
+
+async def broadcast_async(
+    client,
+    chat_ids: Iterable[ChatId],
+    method: str = "sendMessage",
+    concurrency: int = 20,
+    checkpoint: Optional[str] = None,
+    **params,
+) -> AsyncIterator[BroadcastResult]:
+    """Async counterpart of broadcast(): up to `concurrency` sends in flight as tasks."""
+    if client.rate_limiter is None:
+        limiter = RateLimiter()
+        send = lambda chat_id: limiter.call_async(chat_id, lambda: client.call_async(method, chat_id=chat_id, **params))
+    else:
+        send = lambda chat_id: client.call_async(method, chat_id=chat_id, **params)
+    done = _Checkpoint(checkpoint) if checkpoint else None
+    pending = set()
+    try:
+        for chat_id in chat_ids:
+            if done is not None and chat_id in done:
+                continue
+            if len(pending) >= concurrency:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    outcome = task.result()
+                    if done is not None:
+                        done.record(outcome)
+                    yield outcome
+            pending.add(asyncio.ensure_future(_send_one_async(send, chat_id)))
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                outcome = task.result()
+                if done is not None:
+                    done.record(outcome)
+                yield outcome
+    finally:
+        for task in pending:
+            task.cancel()
+        if done is not None:
+            done.close()
@@ -1,8 +1,149 @@
 """Telegram Bot API client (sync and async share parsing and error handling)."""
 
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from itertools import count
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator, Optional, Union
 import httpx
+from . import codec
+from .broadcast import BroadcastResult, broadcast, broadcast_async
 from .exceptions import TelegramAPIError
-from .utils import snake_to_camel
+from .files import FileIdCache, find_uploads, form_fields
+from .outbox import AsyncSendQueue, SendQueue
+from .ratelimit import RateLimiter
+from .utils import reset_after_fork, snake_to_camel
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_POLL_METHOD = "getUpdates"
+_DOWNLOAD_CHUNK = 64 * 1024
+# Failures that happen before the request reaches Telegram: always safe to retry.
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass
+class HTTPOptions:
+    """Connection pool, protocol and timeout settings shared by Client and AsyncClient.
+
+    getUpdates runs on its own small pool (poll_connections), so a long poll never holds a
+    connection that sends need; its read timeout is read_timeout plus the long-poll timeout.
+    http2=True needs the h2 package (pip install httpx[http2]).
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 10.0
+    read_timeout: float = 30.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 30.0
+    poll_connections: int = 2
+
+    def client_kwargs(self, poll: bool = False) -> dict:
+        connections = self.poll_connections if poll else self.max_connections
+        keepalive = self.poll_connections if poll else self.max_keepalive_connections
+        return {
+            "limits": httpx.Limits(
+                max_connections=connections,
+                max_keepalive_connections=keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            "timeout": self.timeout(),
+            "http2": self.http2,
+        }
+
+    def timeout(self, extra_read: float = 0.0) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout + extra_read,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+class RetryPolicy:
+    """Retries transient API failures with jittered exponential backoff; a circuit breaker fails fast in outages.
+
+    Transient failures are network errors and 5xx answers. Requests that never reached Telegram
+    (connect errors, pool timeouts) are retried for every method; ones that may have been processed
+    are retried only for idempotent methods (idempotent_prefixes), so a send is never duplicated.
+    After failure_threshold transient failures in a row the circuit opens: calls raise CIRCUIT_OPEN
+    immediately for reset_timeout seconds, then go through again. 429s are left to RateLimiter.
+    Shared by Bot's clients and polling loops.
+    """
+
+    idempotent_prefixes = ("get", "set", "delete", "edit", "answer")
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number attempt (0-based): exponential, capped, with equal jitter."""
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def open_for(self) -> float:
+        """Seconds until the circuit closes again (0 while closed)."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def wait(self, failures: int) -> float:
+        """How long a polling loop should sleep after `failures` consecutive errors."""
+        return max(self.backoff(max(failures - 1, 0)), self.open_for())
+
+    def check(self, method: str):
+        """Raise CIRCUIT_OPEN while the circuit is open."""
+        remaining = self.open_for()
+        if remaining > 0:
+            raise TelegramAPIError(
+                error_code="CIRCUIT_OPEN",
+                description=f"API unavailable, failing fast for {remaining:.1f}s",
+                method=method,
+            )
+
+    def succeeded(self):
+        if self._failures:
+            with self._lock:
+                self._failures = 0
+
+    def failed(self, method: str, error: BaseException, attempt: int) -> Optional[float]:
+        """Record a failed attempt; returns the delay before retrying, or None to give up."""
+        cause = error.__cause__
+        if method == _POLL_METHOD and isinstance(cause, httpx.ReadTimeout):
+            return None  # an empty long poll, not a failure
+        not_sent = isinstance(cause, _NOT_SENT)
+        transient = not_sent or isinstance(cause, httpx.TransportError) or (
+            isinstance(error, TelegramAPIError) and isinstance(error.error_code, int) and error.error_code >= 500
+        )
+        if not transient:
+            self.succeeded()  # the API answered
+            return None
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.reset_timeout
+        if attempt >= self.max_retries or self.open_for() > 0:
+            return None
+        if not (not_sent or method.startswith(self.idempotent_prefixes)):
+            return None
+        return self.backoff(attempt)
 
 
 def _result_or_raise(data: dict, method: str):
@@ -13,51 +154,254 @@ def _result_or_raise(data: dict, method: str):
         error_code=data.get("error_code", "Unknown"),
         description=data.get("description", "Unknown error"),
         method=method,
+        parameters=data.get("parameters"),
     )
 
 
 def _error_from_http_response(response, method: str):
     """Shared: build TelegramAPIError from failed HTTP response."""
     try:
-        body = response.json()
+        body = codec.loads(response.content)
         code = body.get("error_code", response.status_code)
         desc = body.get("description", response.text[:200])
+        parameters = body.get("parameters")
     except Exception:
         code = response.status_code
         desc = f"HTTP {response.status_code} error"
-    return TelegramAPIError(error_code=code, description=desc, method=method)
+        parameters = None
+    return TelegramAPIError(error_code=code, description=desc, method=method, parameters=parameters)
+
+
+def _network_error(error: httpx.HTTPError, method: str) -> TelegramAPIError:
+    return TelegramAPIError(
+        error_code="HTTP_ERROR",
+        description=f"Network error: {type(error).__name__}",
+        method=method,
+    )
+
+
+def _stale_file_id(error: TelegramAPIError) -> bool:
+    """Telegram rejected a file_id (expired or from another bot): upload the file again."""
+    return error.error_code == 400 and "file" in str(error.description).lower()
+
+
+def _open_uploads(uploads: dict):
+    """(multipart files mapping, file objects to close afterwards)."""
+    files, owned = {}, []
+    try:
+        for name, upload in uploads.items():
+            fileobj, must_close = upload.open()
+            if must_close:
+                owned.append(fileobj)
+            files[name] = (upload.filename, fileobj, upload.content_type)
+    except BaseException:
+        _close_all(owned)
+        raise
+    return files, owned
+
+
+def _close_all(fileobjs):
+    for fileobj in fileobjs:
+        fileobj.close()
+
+
+def _remove_partial(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _remember(obj, name: str, method):
+    """Memoize a proxied API method on the instance, so later lookups are plain attribute hits."""
+    if not name.startswith("_"):
+        obj.__dict__[name] = method
 
 
 class Client:
-    """Sync HTTP client for the Telegram Bot API with persistent session."""
+    """Sync HTTP client for the Telegram Bot API with persistent session.
+
+    With a RateLimiter, send-type calls wait for their slot and are retried after 429s.
+    Transient failures are retried per RetryPolicy (backoff, idempotency, circuit breaker).
+    HTTPOptions tune the connection pools and timeouts.
+    Parameters given as InputFile, pathlib.Path or an open binary file are streamed as
+    multipart uploads; the returned file_id is cached (see FileIdCache) so sending the same
+    file again only sends its id.
+    """
 
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        rate_limiter: Optional[RateLimiter] = None,
+        http: Optional[HTTPOptions] = None,
+        file_ids: Optional[FileIdCache] = None,
+        retry: Optional[RetryPolicy] = None,
+    ):
         self.token = token
         self.base_url = f"https://api.telegram.org/bot{token}"
-        self._client = httpx.Client()
+        self.file_url = f"https://api.telegram.org/file/bot{token}"
+        self.rate_limiter = rate_limiter
+        self.http = http or HTTPOptions()
+        self.file_ids = file_ids if file_ids is not None else FileIdCache()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self._client = httpx.Client(**self.http.client_kwargs())
+        self._poll_client: Optional[httpx.Client] = None
+        self._send_queue: Optional[SendQueue] = None
+        reset_after_fork(self)
+
+    def _reset_after_fork(self):
+        # The parent's sockets and send-queue threads are not ours to use (or close) in the child.
+        self._client = httpx.Client(**self.http.client_kwargs())
+        self._poll_client = None
+        self._send_queue = None
+
+    def _get_poll_client(self) -> httpx.Client:
+        if self._poll_client is None or self._poll_client.is_closed:
+            self._poll_client = httpx.Client(**self.http.client_kwargs(poll=True))
+        return self._poll_client
 
     def call(self, method: str, **params) -> dict:
+        limiter = self.rate_limiter
+        if limiter is not None and limiter.applies(method):
+            return limiter.call(params.get("chat_id"), lambda: self._request(method, params))
+        return self._request(method, params)
+
+    def _request(self, method: str, params: dict) -> dict:
+        uploads = find_uploads(params)
+        if uploads:
+            return self._upload(method, params, uploads)
+        return self._post(method, params, content=codec.dumps(params), headers=_JSON_HEADERS)
+
+    def _upload(self, method: str, params: dict, uploads: dict) -> dict:
+        """Stream local files as multipart/form-data, or send their cached file_id instead."""
+        sent, pending, keys = self.file_ids.substitute(params, uploads)
+        try:
+            result = self._send_files(method, sent, pending)
+        except TelegramAPIError as e:
+            if len(pending) == len(uploads) or not _stale_file_id(e):
+                raise
+            for name in uploads.keys() - pending.keys():
+                self.file_ids.discard(keys[name])
+            sent, pending, keys = self.file_ids.substitute(params, uploads)
+            result = self._send_files(method, sent, pending)
+        self.file_ids.remember(keys, pending, result)
+        return result
+
+    def _send_files(self, method: str, params: dict, pending: dict) -> dict:
+        if not pending:
+            return self._post(method, params, content=codec.dumps(params), headers=_JSON_HEADERS)
+        files, owned = _open_uploads(pending)
+        try:
+            return self._post(method, params, data=form_fields(params, pending), files=files)
+        finally:
+            _close_all(owned)
+
+    def _post(self, method: str, params: dict, **body) -> dict:
+        retry = self.retry
+        for attempt in count():
+            retry.check(method)
+            try:
+                result = self._post_once(method, params, **body)
+            except (TelegramAPIError, TimeoutError) as e:
+                delay = retry.failed(method, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                retry.succeeded()
+                return result
+
+    def _post_once(self, method: str, params: dict, **body) -> dict:
         url = f"{self.base_url}/{method}"
+        if method == _POLL_METHOD:
+            client = self._get_poll_client()
+            timeout = self.http.timeout(extra_read=params.get("timeout", 0))
+        else:
+            client = self._client
+            timeout = httpx.USE_CLIENT_DEFAULT
         try:
-            response = self._client.post(url, json=params, timeout=30.0)
+            response = client.post(url, timeout=timeout, **body)
             response.raise_for_status()
-            return _result_or_raise(response.json(), method)
+            return _result_or_raise(codec.loads(response.content), method)
         except (httpx.ReadTimeout, httpx.ConnectTimeout) as e:
             raise TimeoutError("Long polling timeout (normal)") from e
         except TelegramAPIError:
             raise
         except httpx.HTTPStatusError as e:
-            raise _error_from_http_response(e.response, method)
+            raise _error_from_http_response(e.response, method) from e
         except httpx.HTTPError as e:
-            raise TelegramAPIError(
-                error_code="HTTP_ERROR",
-                description=f"Network error: {type(e).__name__}",
-                method=method,
-            )
+            raise _network_error(e, method) from e
+
+    def iter_file(self, file_id: str, chunk_size: int = _DOWNLOAD_CHUNK) -> Iterator[bytes]:
+        """Stream a file's bytes in chunks of up to chunk_size (file_path resolved via getFile)."""
+        url = f"{self.file_url}/{self.call('getFile', file_id=file_id)['file_path']}"
+        try:
+            with self._client.stream("GET", url) as response:
+                if response.is_error:
+                    response.read()
+                    raise _error_from_http_response(response, "getFile")
+                yield from response.iter_bytes(chunk_size)
+        except httpx.HTTPError as e:
+            raise _network_error(e, "getFile") from e
+
+    def download_file(
+        self,
+        file_id: str,
+        destination: Union[str, os.PathLike, BinaryIO],
+        chunk_size: int = _DOWNLOAD_CHUNK,
+    ):
+        """Download a file to a path or writable binary file without holding it in memory; returns destination.
+
+        A partly written path is removed if the download fails.
+        """
+        if not isinstance(destination, (str, os.PathLike)):
+            for chunk in self.iter_file(file_id, chunk_size):
+                destination.write(chunk)
+            return destination
+        try:
+            with open(destination, "wb") as f:
+                for chunk in self.iter_file(file_id, chunk_size):
+                    f.write(chunk)
+        except BaseException:
+            _remove_partial(destination)
+            raise
+        return destination
+
+    def broadcast(
+        self,
+        chat_ids: Iterable,
+        method: str = "sendMessage",
+        concurrency: int = 20,
+        checkpoint: Optional[str] = None,
+        **params,
+    ) -> Iterator[BroadcastResult]:
+        """Send the same call to many chats concurrently; yields one BroadcastResult per chat as it finishes.
+
+        checkpoint: optional file path; finished chats are recorded there and skipped on rerun.
+        """
+        return broadcast(self, chat_ids, method, concurrency, checkpoint, **params)
+
+    @property
+    def enqueue(self) -> SendQueue:
+        """Fire-and-forget calls: client.enqueue.send_message(...) returns a Future; see SendQueue.
+
+        Assign a SendQueue(client, workers=...) to configure it.
+        """
+        if self._send_queue is None:
+            self._send_queue = SendQueue(self)
+        return self._send_queue
+
+    @enqueue.setter
+    def enqueue(self, send_queue: SendQueue):
+        self._send_queue = send_queue
 
     def close(self):
-        """Close the HTTP session."""
+        """Send queued calls, then close the HTTP sessions."""
+        if self._send_queue is not None:
+            self._send_queue.close()
         self._client.close()
+        if self._poll_client is not None:
+            self._poll_client.close()
 
     def __enter__(self):
         return self
@@ -66,50 +410,186 @@ class Client:
         self.close()
 
     def __getattr__(self, name: str):
-        def method(**params):
-            return self.call(snake_to_camel(name), **params)
+        method = partial(self.call, snake_to_camel(name))
+        _remember(self, name, method)
         return method
 
 
 class AsyncClient:
     """Async HTTP client with persistent session; same API surface as Client."""
 
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        rate_limiter: Optional[RateLimiter] = None,
+        http: Optional[HTTPOptions] = None,
+        file_ids: Optional[FileIdCache] = None,
+        retry: Optional[RetryPolicy] = None,
+    ):
         self.token = token
         self.base_url = f"https://api.telegram.org/bot{token}"
+        self.file_url = f"https://api.telegram.org/file/bot{token}"
+        self.rate_limiter = rate_limiter
+        self.http = http or HTTPOptions()
+        self.file_ids = file_ids if file_ids is not None else FileIdCache()
+        self.retry = retry if retry is not None else RetryPolicy()
         self._client: httpx.AsyncClient | None = None
+        self._poll_client: httpx.AsyncClient | None = None
+        self._send_queue: Optional[AsyncSendQueue] = None
+        reset_after_fork(self)
+
+    def _reset_after_fork(self):
+        self._client = self._poll_client = None
+        self._send_queue = None
 
     async def _get_client(self) -> httpx.AsyncClient:
         """Lazy initialization of the HTTP session."""
         if self._client is None or self._client.is_closed:
-            self._client = httpx.AsyncClient()
+            self._client = httpx.AsyncClient(**self.http.client_kwargs())
         return self._client
 
+    async def _get_poll_client(self) -> httpx.AsyncClient:
+        if self._poll_client is None or self._poll_client.is_closed:
+            self._poll_client = httpx.AsyncClient(**self.http.client_kwargs(poll=True))
+        return self._poll_client
+
     async def call_async(self, method: str, **params):
+        limiter = self.rate_limiter
+        if limiter is not None and limiter.applies(method):
+            return await limiter.call_async(params.get("chat_id"), lambda: self._request(method, params))
+        return await self._request(method, params)
+
+    async def _request(self, method: str, params: dict):
+        uploads = find_uploads(params)
+        if uploads:
+            return await self._upload(method, params, uploads)
+        return await self._post(method, params, content=codec.dumps(params), headers=_JSON_HEADERS)
+
+    async def _upload(self, method: str, params: dict, uploads: dict):
+        sent, pending, keys = self.file_ids.substitute(params, uploads)
+        try:
+            result = await self._send_files(method, sent, pending)
+        except TelegramAPIError as e:
+            if len(pending) == len(uploads) or not _stale_file_id(e):
+                raise
+            for name in uploads.keys() - pending.keys():
+                self.file_ids.discard(keys[name])
+            sent, pending, keys = self.file_ids.substitute(params, uploads)
+            result = await self._send_files(method, sent, pending)
+        self.file_ids.remember(keys, pending, result)
+        return result
+
+    async def _send_files(self, method: str, params: dict, pending: dict):
+        if not pending:
+            return await self._post(method, params, content=codec.dumps(params), headers=_JSON_HEADERS)
+        files, owned = _open_uploads(pending)
+        try:
+            return await self._post(method, params, data=form_fields(params, pending), files=files)
+        finally:
+            _close_all(owned)
+
+    async def _post(self, method: str, params: dict, **body):
+        retry = self.retry
+        for attempt in count():
+            retry.check(method)
+            try:
+                result = await self._post_once(method, params, **body)
+            except (TelegramAPIError, TimeoutError) as e:
+                delay = retry.failed(method, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                retry.succeeded()
+                return result
+
+    async def _post_once(self, method: str, params: dict, **body):
         url = f"{self.base_url}/{method}"
-        client = await self._get_client()
+        if method == _POLL_METHOD:
+            client = await self._get_poll_client()
+            timeout = self.http.timeout(extra_read=params.get("timeout", 0))
+        else:
+            client = await self._get_client()
+            timeout = httpx.USE_CLIENT_DEFAULT
         try:
-            response = await client.post(url, json=params, timeout=30.0)
+            response = await client.post(url, timeout=timeout, **body)
             response.raise_for_status()
-            return _result_or_raise(response.json(), method)
+            return _result_or_raise(codec.loads(response.content), method)
         except (httpx.ReadTimeout, httpx.ConnectTimeout) as e:
             raise TimeoutError("Long polling timeout (normal)") from e
         except TelegramAPIError:
             raise
         except httpx.HTTPStatusError as e:
-            raise _error_from_http_response(e.response, method)
+            raise _error_from_http_response(e.response, method) from e
         except httpx.HTTPError as e:
-            raise TelegramAPIError(
-                error_code="HTTP_ERROR",
-                description=f"Network error: {type(e).__name__}",
-                method=method,
-            )
+            raise _network_error(e, method) from e
+
+    async def iter_file(self, file_id: str, chunk_size: int = _DOWNLOAD_CHUNK) -> AsyncIterator[bytes]:
+        """Async counterpart of Client.iter_file: `async for chunk in client.iter_file(file_id)`."""
+        file = await self.call_async("getFile", file_id=file_id)
+        client = await self._get_client()
+        try:
+            async with client.stream("GET", f"{self.file_url}/{file['file_path']}") as response:
+                if response.is_error:
+                    await response.aread()
+                    raise _error_from_http_response(response, "getFile")
+                async for chunk in response.aiter_bytes(chunk_size):
+                    yield chunk
+        except httpx.HTTPError as e:
+            raise _network_error(e, "getFile") from e
+
+    async def download_file(
+        self,
+        file_id: str,
+        destination: Union[str, os.PathLike, BinaryIO],
+        chunk_size: int = _DOWNLOAD_CHUNK,
+    ):
+        """Async counterpart of Client.download_file."""
+        if not isinstance(destination, (str, os.PathLike)):
+            async for chunk in self.iter_file(file_id, chunk_size):
+                destination.write(chunk)
+            return destination
+        try:
+            with open(destination, "wb") as f:
+                async for chunk in self.iter_file(file_id, chunk_size):
+                    f.write(chunk)
+        except BaseException:
+            _remove_partial(destination)
+            raise
+        return destination
+
+    def broadcast(
+        self,
+        chat_ids: Iterable,
+        method: str = "sendMessage",
+        concurrency: int = 20,
+        checkpoint: Optional[str] = None,
+        **params,
+    ) -> AsyncIterator[BroadcastResult]:
+        """Async broadcast: `async for result in client.broadcast(ids, text=...)`; see Client.broadcast."""
+        return broadcast_async(self, chat_ids, method, concurrency, checkpoint, **params)
+
+    @property
+    def enqueue(self) -> AsyncSendQueue:
+        """Fire-and-forget calls: async_client.enqueue.send_message(...) returns a Task; see AsyncSendQueue."""
+        if self._send_queue is None:
+            self._send_queue = AsyncSendQueue(self)
+        return self._send_queue
+
+    @enqueue.setter
+    def enqueue(self, send_queue: AsyncSendQueue):
+        self._send_queue = send_queue
 
     async def close(self):
-        """Close the HTTP session."""
+        """Finish queued calls, then close the HTTP sessions."""
+        if self._send_queue is not None:
+            await self._send_queue.drain()
         if self._client is not None and not self._client.is_closed:
             await self._client.aclose()
             self._client = None
+        if self._poll_client is not None and not self._poll_client.is_closed:
+            await self._poll_client.aclose()
+            self._poll_client = None
 
     async def __aenter__(self):
         return self
@@ -118,6 +598,6 @@ class AsyncClient:
         await self.close()
 
     def __getattr__(self, name: str):
-        async def method(**params):
-            return await self.call_async(snake_to_camel(name), **params)
+        method = partial(self.call_async, snake_to_camel(name))
+        _remember(self, name, method)
         return method
@@ -0,0 +1,37 @@
+"""JSON codec shared by client and webhook: orjson or msgspec when installed, stdlib json otherwise.
+
+loads(data) parses str or raw bytes (no decode copy needed); dumps(obj) returns compact UTF-8 bytes.
+Catch DecodeError for invalid input whatever the backend.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+    loads = orjson.loads
+    dumps = orjson.dumps
+    DecodeError: tuple = (ValueError,)  # orjson.JSONDecodeError subclasses ValueError
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    loads = msgspec.json.decode
+    dumps = msgspec.json.encode
+    DecodeError = (ValueError, msgspec.DecodeError)
+else:
+    BACKEND = "json"
+    loads = json.loads
+    DecodeError = (ValueError,)  # JSONDecodeError and UnicodeDecodeError
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
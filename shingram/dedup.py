@@ -0,0 +1,156 @@
+"""Redelivery suppression: updates whose update_id was seen recently are dropped before normalize()."""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+# The shared store is pruned once per this many new ids, not on every insert.
+_PRUNE_EVERY = 1000
+
+
+class SQLiteSeenStore:
+    """Seen update_ids in an SQLite table, shared by the processes (or servers) using the same file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets several writer processes insert without blocking readers.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen_updates (update_id INTEGER PRIMARY KEY, seen_at REAL)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def add(self, update_id: int, seen_at: float) -> bool:
+        """Record update_id; False if it was already there (a redelivery)."""
+        with self._lock, self._db:
+            cursor = self._db.execute("INSERT OR IGNORE INTO seen_updates VALUES (?, ?)", (update_id, seen_at))
+        return cursor.rowcount == 1
+
+    def contains(self, update_id: int) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM seen_updates WHERE update_id = ?", (update_id,)).fetchone() is not None
+
+    def delete(self, update_id: int):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM seen_updates WHERE update_id = ?", (update_id,))
+
+    def prune(self, before: float, keep: int):
+        """Forget ids seen before `before`, and all but the newest `keep`."""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM seen_updates WHERE seen_at < ? OR update_id < (SELECT COALESCE(MIN(update_id), 0) "
+                "FROM (SELECT update_id FROM seen_updates ORDER BY update_id DESC LIMIT ?))",
+                (before, keep),
+            )
+
+    def close(self):
+        self._db.close()
+
+    def __reduce__(self):
+        return SQLiteSeenStore, (self.path,)
+
+
+class UpdateDeduplicator:
+    """Bounded, time-windowed set of seen update_ids: WebhookServer(dedup=...), Runtime.run(dedup=...).
+
+    Telegram redelivers a webhook update when the 200 doesn't arrive in time, and a poller restarted
+    mid-batch is handed the whole unconfirmed batch again. The last max_size ids seen within `window`
+    seconds (None: no time limit) are kept in a ring buffer plus a dict, so checking one costs a dict
+    lookup. store: an SQLite file path (or SQLiteSeenStore) consulted on in-memory misses, so several
+    server processes behind one webhook drop each other's redeliveries, and a restarted process
+    remembers what it dispatched. Polling only repeats updates across restarts, so it needs a store.
+
+    The webhook server records an id on arrival and forgets it again if its handler raised, so the
+    redelivery is dispatched; the runtimes record an id once its handlers have run.
+    """
+
+    def __init__(self, max_size: int = 10_000, window: Optional[float] = 3600.0, store=None):
+        self.max_size = max_size
+        self.window = window
+        self.store = SQLiteSeenStore(os.fspath(store)) if isinstance(store, (str, os.PathLike)) else store
+        self.dropped = 0
+        self._ring: Deque[Tuple[float, int]] = deque()
+        self._ids: Dict[int, float] = {}  # update_id -> when it was seen
+        self._added = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        ring, ids = self._ring, self._ids
+        cutoff = now - self.window if self.window is not None else None
+        while ring and (len(ring) >= self.max_size or (cutoff is not None and ring[0][0] < cutoff)):
+            seen_at, update_id = ring.popleft()
+            # Skip entries left behind by forget(); the id may have been seen again since.
+            if ids.get(update_id) == seen_at:
+                del ids[update_id]
+
+    def _remember(self, update_id: int, now: float) -> bool:
+        """Record update_id (not known in memory); False if the store already had it."""
+        self._expire(now)
+        self._ring.append((now, update_id))
+        self._ids[update_id] = now
+        if self.store is None:
+            return True
+        new = self.store.add(update_id, now)
+        self._added += 1
+        if self._added % _PRUNE_EVERY == 0:
+            self.store.prune(now - self.window if self.window is not None else 0.0, self.max_size)
+        return new
+
+    def seen(self, update_id: int, now: Optional[float] = None) -> bool:
+        """True if update_id is a redelivery; otherwise remember it and return False."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if update_id in self._ids or not self._remember(update_id, now):
+                self.dropped += 1
+                return True
+            return False
+
+    def check(self, update_id: int) -> bool:
+        """True if update_id was recorded before; unlike seen(), doesn't record it."""
+        with self._lock:
+            if update_id in self._ids:
+                return True
+            return self.store is not None and self.store.contains(update_id)
+
+    def record(self, update_id: int, now: Optional[float] = None):
+        """Remember update_id as handled."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if update_id not in self._ids:
+                self._remember(update_id, now)
+
+    def forget(self, update_id: int):
+        """Treat update_id as not seen (its dispatch failed), so a redelivery goes through."""
+        with self._lock:
+            self._ids.pop(update_id, None)
+            if self.store is not None:
+                self.store.delete(update_id)
+
+    def filter(self, updates: Iterable[dict], record: bool = True) -> List[dict]:
+        """The updates not seen before (ones without an update_id are kept).
+
+        With record=False they are only checked; call record() once each is handled.
+        """
+        fresh = []
+        for update in updates:
+            update_id = update.get("update_id") if isinstance(update, dict) else None
+            if update_id is None:
+                fresh.append(update)
+            elif record:
+                if not self.seen(update_id):
+                    fresh.append(update)
+            elif self.check(update_id):
+                self.dropped += 1
+            else:
+                fresh.append(update)
+        return fresh
+
+    def close(self):
+        if self.store is not None and hasattr(self.store, "close"):
+            self.store.close()
+
+    def __len__(self) -> int:
+        return len(self._ids)
@@ -1,7 +1,8 @@
 """Turn raw Telegram updates into Event; used by both sync and async runtimes."""
 
-from dataclasses import dataclass
-from typing import Optional
+import inspect
+from dataclasses import make_dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 
 def _message_content_type(message: dict) -> str:
@@ -11,802 +12,380 @@ def _message_content_type(message: dict) -> str:
     return "text" if message.get("text") is not None else "text"
 
 
-@dataclass
+_LAZY = object()
+
+_EVENT_FIELDS = (
+    "type", "name", "chat_id", "user_id", "text", "raw", "reply_to", "chat_type", "inline_query_id",
+    "callback_query_id", "message_id", "username", "first_name", "chat_title", "last_name",
+    "language_code", "content_type",
+)
+
+
+def _profile_field(slot: str, source: str, key: str) -> property:
+    """Field read from the user/chat dict of the update on first access, then kept in its slot."""
+    def get(self):
+        value = getattr(self, slot)
+        if value is _LAZY:
+            data = getattr(self, source)
+            value = data.get(key) if data else None
+            setattr(self, slot, value)
+        return value
+
+    def set(self, value):
+        setattr(self, slot, value)
+
+    return property(get, set)
+
+
 class Event:
-    """Single shape for all update types; raw payload stays in .raw."""
-    type: str
-    name: str
-    chat_id: int
-    user_id: int
-    text: str
-    raw: dict
-    reply_to: Optional[int] = None
-    chat_type: Optional[str] = None  # "private", "group", "supergroup", "channel"
-    inline_query_id: Optional[str] = None  # For inline_query
-    callback_query_id: Optional[str] = None  # For callback_query
-    message_id: Optional[int] = None  # Message ID (if available)
-    username: Optional[str] = None  # User username (if available)
-    first_name: Optional[str] = None  # User first name (if available)
-    chat_title: Optional[str] = None  # Chat title (for groups/channels)
-    last_name: Optional[str] = None  # User last name (if available)
-    language_code: Optional[str] = None  # User language code (if available)
-    content_type: Optional[str] = None  # "text", "photo", "document", etc. for messages
+    """Single shape for all update types; raw payload stays in .raw.
 
+    Slotted; profile fields (username, chat_title, content_type, ...) of normalized events
+    are computed from .raw only when read.
+    """
 
-def normalize(update_json: dict) -> Optional[Event]:
-    """Build one Event from a getUpdates/item or webhook payload; None if unknown type."""
-    # Handle message updates
-    if "message" in update_json:
-        message = update_json["message"]
-        chat_id = message.get("chat", {}).get("id")
-        
-        if "new_chat_members" in message:
-            new_members = message.get("new_chat_members", [])
-            if new_members:
-                member = new_members[0]
-                user_id = member.get("id")
-                
-                if chat_id is None or user_id is None:
-                    return None
-                
-                chat_type = message.get("chat", {}).get("type")
-                chat_title = message.get("chat", {}).get("title")
-                username = member.get("username")
-                first_name = member.get("first_name")
-                last_name = member.get("last_name")
-                language_code = member.get("language_code")
-                return Event(
-                    type="join",
-                    name="",
-                    chat_id=chat_id,
-                    user_id=user_id,
-                    text="",
-                    raw=update_json,
-                    reply_to=None,
-                    chat_type=chat_type,
-                    message_id=message.get("message_id"),
-                    username=username,
-                    first_name=first_name,
-                    chat_title=chat_title,
-                    last_name=last_name,
-                    language_code=language_code,
-                )
-        
-        if "left_chat_member" in message:
-            left_member = message.get("left_chat_member", {})
-            user_id = left_member.get("id")
-            
+    __slots__ = (
+        "type", "name", "chat_id", "user_id", "text", "raw", "reply_to", "inline_query_id",
+        "callback_query_id", "message_id", "_user", "_chat", "_message", "_chat_type", "_username",
+        "_first_name", "_chat_title", "_last_name", "_language_code", "_content_type",
+    )
+
+    def __init__(
+        self,
+        type: str,
+        name: str,
+        chat_id: int,
+        user_id: int,
+        text: str,
+        raw: dict,
+        reply_to: Optional[int] = None,
+        chat_type: Optional[str] = None,  # "private", "group", "supergroup", "channel"
+        inline_query_id: Optional[str] = None,  # For inline_query
+        callback_query_id: Optional[str] = None,  # For callback_query
+        message_id: Optional[int] = None,  # Message ID (if available)
+        username: Optional[str] = None,  # User username (if available)
+        first_name: Optional[str] = None,  # User first name (if available)
+        chat_title: Optional[str] = None,  # Chat title (for groups/channels)
+        last_name: Optional[str] = None,  # User last name (if available)
+        language_code: Optional[str] = None,  # User language code (if available)
+        content_type: Optional[str] = None,  # "text", "photo", "document", etc. for messages
+    ):
+        self.type = type
+        self.name = name
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.text = text
+        self.raw = raw
+        self.reply_to = reply_to
+        self.inline_query_id = inline_query_id
+        self.callback_query_id = callback_query_id
+        self.message_id = message_id
+        self._user = self._chat = self._message = None
+        self._chat_type = chat_type
+        self._username = username
+        self._first_name = first_name
+        self._chat_title = chat_title
+        self._last_name = last_name
+        self._language_code = language_code
+        self._content_type = content_type
+
+    chat_type = _profile_field("_chat_type", "_chat", "type")
+    chat_title = _profile_field("_chat_title", "_chat", "title")
+    username = _profile_field("_username", "_user", "username")
+    first_name = _profile_field("_first_name", "_user", "first_name")
+    last_name = _profile_field("_last_name", "_user", "last_name")
+    language_code = _profile_field("_language_code", "_user", "language_code")
+
+    @property
+    def content_type(self) -> Optional[str]:
+        value = self._content_type
+        if value is _LAZY:
+            value = self._content_type = _message_content_type(self._message)
+        return value
+
+    @content_type.setter
+    def content_type(self, value: Optional[str]):
+        self._content_type = value
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in _EVENT_FIELDS)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Pickle as a plain Event: lazy fields are resolved, the sentinel never crosses processes.
+        return Event, tuple(getattr(self, f) for f in _EVENT_FIELDS)
+
+    def __repr__(self):
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in _EVENT_FIELDS)
+        return f"Event({fields})"
+
+
+def _dataclass_fields() -> dict:
+    """Field specs matching Event.__init__, as the @dataclass Event had them."""
+    spec = [
+        (p.name, p.annotation) if p.default is p.empty else (p.name, p.annotation, p.default)
+        for p in list(inspect.signature(Event.__init__).parameters.values())[1:]
+    ]
+    return make_dataclass("Event", spec).__dataclass_fields__
+
+
+# Event was a dataclass before it was slotted: dataclasses.fields(), replace() and asdict() still work.
+Event.__dataclass_fields__ = _dataclass_fields()
+
+
+def _event(
+    type: str,
+    name: str,
+    chat_id: int,
+    user_id: int,
+    text: str,
+    raw: dict,
+    user: Optional[dict],
+    chat: Optional[dict],
+    reply_to: Optional[int] = None,
+    message_id: Optional[int] = None,
+    message: Optional[dict] = None,
+    inline_query_id: Optional[str] = None,
+    callback_query_id: Optional[str] = None,
+) -> Event:
+    """Shared builder: profile fields stay unread until accessed (user/chat dicts, content_type from message)."""
+    event = Event.__new__(Event)
+    event.type = type
+    event.name = name
+    event.chat_id = chat_id
+    event.user_id = user_id
+    event.text = text
+    event.raw = raw
+    event.reply_to = reply_to
+    event.inline_query_id = inline_query_id
+    event.callback_query_id = callback_query_id
+    event.message_id = message_id
+    event._user = user
+    event._chat = chat
+    event._message = message
+    event._chat_type = event._chat_title = _LAZY
+    event._username = event._first_name = event._last_name = event._language_code = _LAZY
+    event._content_type = _LAZY if message is not None else None
+    return event
+
+
+def _ordering_key(event: Event):
+    """Events sharing a key must be handled in order: the chat, or the user for chat-less updates (inline queries, ...)."""
+    return event.chat_id or event.user_id or None
+
+
+def _command_name(text: str) -> str:
+    return text.split()[0][1:].split("@")[0]
+
+
+def _message_extractor(event_type: str, commands: bool, from_user: bool) -> Callable[[dict, dict], Optional[Event]]:
+    """Extractor for message-shaped payloads (message, edited_message, channel_post, business_message, ...)."""
+    def extract(message: dict, update_json: dict) -> Optional[Event]:
+        chat = message.get("chat", {})
+        chat_id = chat.get("id")
+        if from_user:
+            user = message.get("from")
+            user_id = user.get("id") if user else None
             if chat_id is None or user_id is None:
                 return None
-            
-            chat_type = message.get("chat", {}).get("type")
-            chat_title = message.get("chat", {}).get("title")
-            username = left_member.get("username")
-            first_name = left_member.get("first_name")
-            last_name = left_member.get("last_name")
-            language_code = left_member.get("language_code")
-            return Event(
-                type="leave",
-                name="",
-                chat_id=chat_id,
-                user_id=user_id,
-                text="",
-                raw=update_json,
-                reply_to=None,
-                chat_type=chat_type,
-                message_id=message.get("message_id"),
-                username=username,
-                first_name=first_name,
-                chat_title=chat_title,
-                last_name=last_name,
-                language_code=language_code,
-            )
-        
-        # Handle regular messages and commands
-        user = message.get("from")
-        user_id = user.get("id") if user else None
-        text = message.get("text", "")
-        chat_type = message.get("chat", {}).get("type")
-        chat_title = message.get("chat", {}).get("title")
-        message_id = message.get("message_id")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        content_type = _message_content_type(message)
-        
-        if chat_id is None or user_id is None:
-            return None
-        
-        if text.startswith("/"):
-            command_parts = text.split()[0][1:].split("@")
-            command_name = command_parts[0]
-            return Event(
-                type="command",
-                name=command_name,
-                chat_id=chat_id,
-                user_id=user_id,
-                text=text,
-                raw=update_json,
-                reply_to=message.get("reply_to_message", {}).get("message_id"),
-                chat_type=chat_type,
-                message_id=message_id,
-                username=username,
-                first_name=first_name,
-                chat_title=chat_title,
-                last_name=last_name,
-                language_code=language_code,
-                content_type=content_type,
-            )
-        
-        return Event(
-            type="message",
-            name="",
-            chat_id=chat_id,
-            user_id=user_id,
-            text=text,
-            raw=update_json,
-            reply_to=message.get("reply_to_message", {}).get("message_id"),
-            chat_type=chat_type,
-            message_id=message_id,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
-            content_type=content_type,
-        )
-    
-    if "callback_query" in update_json:
-        callback = update_json["callback_query"]
-        message = callback.get("message", {})
-        chat_id = message.get("chat", {}).get("id") if message else None
-        user = callback.get("from", {})
-        user_id = user.get("id") if user else None
-        data = callback.get("data", "")
-        callback_query_id = callback.get("id")
-        chat_type = message.get("chat", {}).get("type") if message else None
-        chat_title = message.get("chat", {}).get("title") if message else None
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
-        if chat_id is None or user_id is None:
-            return None
-        
-        return Event(
-            type="callback",
-            name=data.split(":")[0] if ":" in data else data,
-            chat_id=chat_id,
-            user_id=user_id,
-            text=data,
-            raw=update_json,
-            reply_to=message.get("message_id") if message else None,
-            chat_type=chat_type,
-            callback_query_id=callback_query_id,
-            message_id=message.get("message_id") if message else None,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "inline_query" in update_json:
-        inline = update_json["inline_query"]
-        user = inline.get("from", {})
-        user_id = user.get("id") if user else None
-        query = inline.get("query", "")
-        inline_query_id = inline.get("id")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
-        if user_id is None:
-            return None
-        
-        return Event(
-            type="inline_query",
-            name="",
-            chat_id=0,  # Inline queries don't have chat_id
-            user_id=user_id,
-            text=query,
-            raw=update_json,
-            reply_to=None,
-            inline_query_id=inline_query_id,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "edited_message" in update_json:
-        message = update_json["edited_message"]
-        chat_id = message.get("chat", {}).get("id")
-        user = message.get("from")
-        user_id = user.get("id") if user else None
-        text = message.get("text", "")
-        chat_type = message.get("chat", {}).get("type")
-        chat_title = message.get("chat", {}).get("title")
-        message_id = message.get("message_id")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        content_type = _message_content_type(message)
-        
-        if chat_id is None or user_id is None:
-            return None
-        
-        return Event(
-            type="edited_message",
-            name="",
-            chat_id=chat_id,
-            user_id=user_id,
-            text=text,
-            raw=update_json,
-            reply_to=message.get("reply_to_message", {}).get("message_id"),
-            chat_type=chat_type,
-            message_id=message_id,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
-            content_type=content_type,
-        )
-    
-    if "channel_post" in update_json:
-        message = update_json["channel_post"]
-        chat_id = message.get("chat", {}).get("id")
-        text = message.get("text", "")
-        chat_type = message.get("chat", {}).get("type")
-        chat_title = message.get("chat", {}).get("title")
-        message_id = message.get("message_id")
-        content_type = _message_content_type(message)
-        
-        if chat_id is None:
-            return None
-        
-        if text.startswith("/"):
-            command_parts = text.split()[0][1:].split("@")
-            command_name = command_parts[0]
-            return Event(
-                type="command",
-                name=command_name,
-                chat_id=chat_id,
-                user_id=0,  # Channel posts don't have from user
-                text=text,
-                raw=update_json,
-                reply_to=message.get("reply_to_message", {}).get("message_id"),
-                chat_type=chat_type,
-                message_id=message_id,
-                chat_title=chat_title,
-                content_type=content_type,
-            )
-        
-        return Event(
-            type="channel_post",
-            name="",
-            chat_id=chat_id,
-            user_id=0,
-            text=text,
-            raw=update_json,
-            reply_to=message.get("reply_to_message", {}).get("message_id"),
-            chat_type=chat_type,
-            message_id=message_id,
-            chat_title=chat_title,
-            content_type=content_type,
-        )
-    
-    if "poll_answer" in update_json:
-        poll = update_json["poll_answer"]
-        user = poll.get("user", {})
-        user_id = user.get("id") if user else None
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
-        if user_id is None:
-            return None
-        
-        return Event(
-            type="poll_answer",
-            name="",
-            chat_id=0,  # Poll answers don't have direct chat_id
-            user_id=user_id,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "edited_channel_post" in update_json:
-        message = update_json["edited_channel_post"]
-        chat_id = message.get("chat", {}).get("id")
+        else:
+            # Channel posts don't have a from user
+            user = None
+            user_id = 0
+            if chat_id is None:
+                return None
         text = message.get("text", "")
-        chat_type = message.get("chat", {}).get("type")
-        chat_title = message.get("chat", {}).get("title")
-        message_id = message.get("message_id")
-        content_type = _message_content_type(message)
-        
-        if chat_id is None:
-            return None
-        
-        if text.startswith("/"):
-            command_parts = text.split()[0][1:].split("@")
-            command_name = command_parts[0]
-            return Event(
-                type="command",
-                name=command_name,
-                chat_id=chat_id,
-                user_id=0,
-                text=text,
-                raw=update_json,
-                reply_to=message.get("reply_to_message", {}).get("message_id"),
-                chat_type=chat_type,
-                message_id=message_id,
-                chat_title=chat_title,
-                content_type=content_type,
-            )
-        
-        return Event(
-            type="edited_channel_post",
-            name="",
-            chat_id=chat_id,
-            user_id=0,
-            text=text,
-            raw=update_json,
+        type_, name = event_type, ""
+        if commands and text.startswith("/"):
+            type_, name = "command", _command_name(text)
+        return _event(
+            type_, name, chat_id, user_id, text, update_json, user, chat,
             reply_to=message.get("reply_to_message", {}).get("message_id"),
-            chat_type=chat_type,
-            message_id=message_id,
-            chat_title=chat_title,
-            content_type=content_type,
-        )
-    
-    if "chosen_inline_result" in update_json:
-        chosen = update_json["chosen_inline_result"]
-        user = chosen.get("from", {})
-        user_id = user.get("id") if user else None
-        result_id = chosen.get("result_id", "")
-        query = chosen.get("query", "")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
-        if user_id is None:
-            return None
-        
-        return Event(
-            type="chosen_inline_result",
-            name=result_id,
-            chat_id=0,
-            user_id=user_id,
-            text=query,
-            raw=update_json,
-            reply_to=None,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "shipping_query" in update_json:
-        shipping = update_json["shipping_query"]
-        user = shipping.get("from", {})
-        user_id = user.get("id") if user else None
-        query_id = shipping.get("id", "")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
-        if user_id is None:
-            return None
-        
-        return Event(
-            type="shipping_query",
-            name=query_id,
-            chat_id=0,
-            user_id=user_id,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "pre_checkout_query" in update_json:
-        checkout = update_json["pre_checkout_query"]
-        user = checkout.get("from", {})
-        user_id = user.get("id") if user else None
-        query_id = checkout.get("id", "")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
-        if user_id is None:
-            return None
-        
-        return Event(
-            type="pre_checkout_query",
-            name=query_id,
-            chat_id=0,
-            user_id=user_id,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "chat_member" in update_json:
-        chat_member = update_json["chat_member"]
-        chat = chat_member.get("chat", {})
-        chat_id = chat.get("id")
-        member = chat_member.get("new_chat_member", {}).get("user", {})
-        user_id = member.get("id") if member else None
-        chat_type = chat.get("type")
-        chat_title = chat.get("title")
-        username = member.get("username") if member else None
-        first_name = member.get("first_name") if member else None
-        last_name = member.get("last_name") if member else None
-        language_code = member.get("language_code") if member else None
-        
-        if chat_id is None or user_id is None:
-            return None
-        
-        status = chat_member.get("new_chat_member", {}).get("status", "")
-        
-        return Event(
-            type="chat_member",
-            name=status,
-            chat_id=chat_id,
-            user_id=user_id,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            chat_type=chat_type,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "my_chat_member" in update_json:
-        my_member = update_json["my_chat_member"]
-        chat = my_member.get("chat", {})
-        chat_id = chat.get("id")
-        member = my_member.get("new_chat_member", {}).get("user", {})
-        user_id = member.get("id") if member else None
-        chat_type = chat.get("type")
-        chat_title = chat.get("title")
-        username = member.get("username") if member else None
-        first_name = member.get("first_name") if member else None
-        last_name = member.get("last_name") if member else None
-        language_code = member.get("language_code") if member else None
-        
-        if chat_id is None or user_id is None:
-            return None
-        
-        status = my_member.get("new_chat_member", {}).get("status", "")
-        
-        return Event(
-            type="my_chat_member",
-            name=status,
-            chat_id=chat_id,
-            user_id=user_id,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            chat_type=chat_type,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
+            message_id=message.get("message_id"),
+            message=message,
         )
-    
-    if "chat_join_request" in update_json:
-        join_request = update_json["chat_join_request"]
-        chat = join_request.get("chat", {})
-        chat_id = chat.get("id")
-        user = join_request.get("from", {})
-        user_id = user.get("id") if user else None
-        chat_type = chat.get("type")
-        chat_title = chat.get("title")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
-        if chat_id is None or user_id is None:
-            return None
-        
-        return Event(
-            type="chat_join_request",
-            name="",
-            chat_id=chat_id,
-            user_id=user_id,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            chat_type=chat_type,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "business_connection" in update_json:
-        business_conn = update_json["business_connection"]
-        user = business_conn.get("user", {})
+    return extract
+
+
+def _member_event(event_type: str, message: dict, member: dict, update_json: dict) -> Optional[Event]:
+    chat = message.get("chat", {})
+    chat_id = chat.get("id")
+    user_id = member.get("id")
+    if chat_id is None or user_id is None:
+        return None
+    return _event(event_type, "", chat_id, user_id, "", update_json, member, chat, message_id=message.get("message_id"))
+
+
+_plain_message = _message_extractor("message", commands=True, from_user=True)
+
+
+def _message(message: dict, update_json: dict) -> Optional[Event]:
+    if "new_chat_members" in message:
+        new_members = message.get("new_chat_members", [])
+        if new_members:
+            return _member_event("join", message, new_members[0], update_json)
+    if "left_chat_member" in message:
+        return _member_event("leave", message, message.get("left_chat_member", {}), update_json)
+    return _plain_message(message, update_json)
+
+
+def _callback_query(callback: dict, update_json: dict) -> Optional[Event]:
+    message = callback.get("message", {})
+    chat = message.get("chat", {}) if message else None
+    chat_id = chat.get("id") if message else None
+    user = callback.get("from", {})
+    user_id = user.get("id") if user else None
+    if chat_id is None or user_id is None:
+        return None
+    data = callback.get("data", "")
+    message_id = message.get("message_id")
+    return _event(
+        "callback", data.split(":")[0] if ":" in data else data, chat_id, user_id, data, update_json, user, chat,
+        reply_to=message_id,
+        message_id=message_id,
+        callback_query_id=callback.get("id"),
+    )
+
+
+def _inline_query(inline: dict, update_json: dict) -> Optional[Event]:
+    user = inline.get("from", {})
+    user_id = user.get("id") if user else None
+    if user_id is None:
+        return None
+    # Inline queries don't have chat_id
+    return _event(
+        "inline_query", "", 0, user_id, inline.get("query", ""), update_json, user, None,
+        inline_query_id=inline.get("id"),
+    )
+
+
+def _user_extractor(event_type: str, user_key: str, name_key: Optional[str], text_key: Optional[str]) -> Callable[[dict, dict], Optional[Event]]:
+    """Extractor for chat-less updates that only carry a user (poll_answer, shipping_query, ...)."""
+    def extract(payload: dict, update_json: dict) -> Optional[Event]:
+        user = payload.get(user_key, {})
         user_id = user.get("id") if user else None
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
         if user_id is None:
             return None
-        
-        return Event(
-            type="business_connection",
-            name="",
-            chat_id=0,
-            user_id=user_id,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "business_message" in update_json:
-        message = update_json["business_message"]
-        chat_id = message.get("chat", {}).get("id")
-        user = message.get("from")
-        user_id = user.get("id") if user else None
-        text = message.get("text", "")
-        chat_type = message.get("chat", {}).get("type")
-        chat_title = message.get("chat", {}).get("title")
-        message_id = message.get("message_id")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        content_type = _message_content_type(message)
-        
-        if chat_id is None or user_id is None:
-            return None
-        
-        if text.startswith("/"):
-            command_parts = text.split()[0][1:].split("@")
-            command_name = command_parts[0]
-            return Event(
-                type="command",
-                name=command_name,
-                chat_id=chat_id,
-                user_id=user_id,
-                text=text,
-                raw=update_json,
-                reply_to=message.get("reply_to_message", {}).get("message_id"),
-                chat_type=chat_type,
-                message_id=message_id,
-                username=username,
-                first_name=first_name,
-                chat_title=chat_title,
-                last_name=last_name,
-                language_code=language_code,
-                content_type=content_type,
-            )
-        
-        return Event(
-            type="business_message",
-            name="",
-            chat_id=chat_id,
-            user_id=user_id,
-            text=text,
-            raw=update_json,
-            reply_to=message.get("reply_to_message", {}).get("message_id"),
-            chat_type=chat_type,
-            message_id=message_id,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
-            content_type=content_type,
-        )
-    
-    if "edited_business_message" in update_json:
-        message = update_json["edited_business_message"]
-        chat_id = message.get("chat", {}).get("id")
-        user = message.get("from")
-        user_id = user.get("id") if user else None
-        text = message.get("text", "")
-        chat_type = message.get("chat", {}).get("type")
-        chat_title = message.get("chat", {}).get("title")
-        message_id = message.get("message_id")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        content_type = _message_content_type(message)
-        
-        if chat_id is None or user_id is None:
-            return None
-        
-        return Event(
-            type="edited_business_message",
-            name="",
-            chat_id=chat_id,
-            user_id=user_id,
-            text=text,
-            raw=update_json,
-            reply_to=message.get("reply_to_message", {}).get("message_id"),
-            chat_type=chat_type,
-            message_id=message_id,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
-            content_type=content_type,
-        )
-    
-    if "deleted_business_messages" in update_json:
-        deleted = update_json["deleted_business_messages"]
-        chat = deleted.get("chat", {})
+        name = payload.get(name_key, "") if name_key else ""
+        text = payload.get(text_key, "") if text_key else ""
+        return _event(event_type, name, 0, user_id, text, update_json, user, None)
+    return extract
+
+
+def _chat_extractor(event_type: str, with_message_id: bool) -> Callable[[dict, dict], Optional[Event]]:
+    """Extractor for user-less updates that only carry a chat (chat_boost, message_reaction_count, ...)."""
+    def extract(payload: dict, update_json: dict) -> Optional[Event]:
+        chat = payload.get("chat", {})
         chat_id = chat.get("id")
-        chat_type = chat.get("type")
-        chat_title = chat.get("title")
-        
         if chat_id is None:
             return None
-        
-        return Event(
-            type="deleted_business_messages",
-            name="",
-            chat_id=chat_id,
-            user_id=0,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            chat_type=chat_type,
-            chat_title=chat_title
-        )
-    
-    if "message_reaction" in update_json:
-        reaction = update_json["message_reaction"]
-        chat = reaction.get("chat", {})
+        message_id = payload.get("message_id") if with_message_id else None
+        return _event(event_type, "", chat_id, 0, "", update_json, None, chat, message_id=message_id)
+    return extract
+
+
+def _chat_member_extractor(event_type: str) -> Callable[[dict, dict], Optional[Event]]:
+    def extract(payload: dict, update_json: dict) -> Optional[Event]:
+        chat = payload.get("chat", {})
         chat_id = chat.get("id")
-        user = reaction.get("user", {})
-        user_id = user.get("id") if user else None
-        message_id = reaction.get("message_id")
-        chat_type = chat.get("type")
-        chat_title = chat.get("title")
-        username = user.get("username") if user else None
-        first_name = user.get("first_name") if user else None
-        last_name = user.get("last_name") if user else None
-        language_code = user.get("language_code") if user else None
-        
+        new_member = payload.get("new_chat_member", {})
+        member = new_member.get("user", {})
+        user_id = member.get("id") if member else None
         if chat_id is None or user_id is None:
             return None
-        
-        return Event(
-            type="message_reaction",
-            name="",
-            chat_id=chat_id,
-            user_id=user_id,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            chat_type=chat_type,
-            message_id=message_id,
-            username=username,
-            first_name=first_name,
-            chat_title=chat_title,
-            last_name=last_name,
-            language_code=language_code,
-        )
-    
-    if "message_reaction_count" in update_json:
-        reaction_count = update_json["message_reaction_count"]
-        chat = reaction_count.get("chat", {})
-        chat_id = chat.get("id")
-        message_id = reaction_count.get("message_id")
-        chat_type = chat.get("type")
-        chat_title = chat.get("title")
-        
-        if chat_id is None:
-            return None
-        
-        return Event(
-            type="message_reaction_count",
-            name="",
-            chat_id=chat_id,
-            user_id=0,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            chat_type=chat_type,
-            message_id=message_id,
-            chat_title=chat_title
-        )
-    
-    if "poll" in update_json:
-        poll = update_json["poll"]
-        poll_id = poll.get("id", "")
-        
-        return Event(
-            type="poll",
-            name=poll_id,
-            chat_id=0,
-            user_id=0,
-            text="",
-            raw=update_json,
-            reply_to=None
-        )
-    
-    if "chat_boost" in update_json:
-        boost = update_json["chat_boost"]
-        chat = boost.get("chat", {})
-        chat_id = chat.get("id")
-        chat_type = chat.get("type")
-        chat_title = chat.get("title")
-        
-        if chat_id is None:
-            return None
-        
-        return Event(
-            type="chat_boost",
-            name="",
-            chat_id=chat_id,
-            user_id=0,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            chat_type=chat_type,
-            chat_title=chat_title
-        )
-    
-    if "removed_chat_boost" in update_json:
-        removed = update_json["removed_chat_boost"]
-        chat = removed.get("chat", {})
-        chat_id = chat.get("id")
-        chat_type = chat.get("type")
-        chat_title = chat.get("title")
-        
-        if chat_id is None:
-            return None
-        
-        return Event(
-            type="removed_chat_boost",
-            name="",
-            chat_id=chat_id,
-            user_id=0,
-            text="",
-            raw=update_json,
-            reply_to=None,
-            chat_type=chat_type,
-            chat_title=chat_title
-        )
-    
+        return _event(event_type, new_member.get("status", ""), chat_id, user_id, "", update_json, member, chat)
+    return extract
+
+
+def _chat_join_request(join_request: dict, update_json: dict) -> Optional[Event]:
+    chat = join_request.get("chat", {})
+    chat_id = chat.get("id")
+    user = join_request.get("from", {})
+    user_id = user.get("id") if user else None
+    if chat_id is None or user_id is None:
+        return None
+    return _event("chat_join_request", "", chat_id, user_id, "", update_json, user, chat)
+
+
+def _message_reaction(reaction: dict, update_json: dict) -> Optional[Event]:
+    chat = reaction.get("chat", {})
+    chat_id = chat.get("id")
+    user = reaction.get("user", {})
+    user_id = user.get("id") if user else None
+    if chat_id is None or user_id is None:
+        return None
+    return _event(
+        "message_reaction", "", chat_id, user_id, "", update_json, user, chat,
+        message_id=reaction.get("message_id"),
+    )
+
+
+def _poll(poll: dict, update_json: dict) -> Optional[Event]:
+    return _event("poll", poll.get("id", ""), 0, 0, "", update_json, None, None)
+
+
+# Update key -> extractor(payload, update_json). A Telegram update carries exactly one of these keys
+# next to update_id, so normalize() finds its extractor with one dict hit per update key.
+_EXTRACTORS: Dict[str, Callable[[dict, dict], Optional[Event]]] = {
+    "message": _message,
+    "callback_query": _callback_query,
+    "inline_query": _inline_query,
+    "edited_message": _message_extractor("edited_message", commands=False, from_user=True),
+    "channel_post": _message_extractor("channel_post", commands=True, from_user=False),
+    "poll_answer": _user_extractor("poll_answer", "user", None, None),
+    "edited_channel_post": _message_extractor("edited_channel_post", commands=True, from_user=False),
+    "chosen_inline_result": _user_extractor("chosen_inline_result", "from", "result_id", "query"),
+    "shipping_query": _user_extractor("shipping_query", "from", "id", None),
+    "pre_checkout_query": _user_extractor("pre_checkout_query", "from", "id", None),
+    "chat_member": _chat_member_extractor("chat_member"),
+    "my_chat_member": _chat_member_extractor("my_chat_member"),
+    "chat_join_request": _chat_join_request,
+    "business_connection": _user_extractor("business_connection", "user", None, None),
+    "business_message": _message_extractor("business_message", commands=True, from_user=True),
+    "edited_business_message": _message_extractor("edited_business_message", commands=False, from_user=True),
+    "deleted_business_messages": _chat_extractor("deleted_business_messages", with_message_id=False),
+    "message_reaction": _message_reaction,
+    "message_reaction_count": _chat_extractor("message_reaction_count", with_message_id=True),
+    "poll": _poll,
+    "chat_boost": _chat_extractor("chat_boost", with_message_id=False),
+    "removed_chat_boost": _chat_extractor("removed_chat_boost", with_message_id=False),
+}
+
+
+def normalize(update_json: dict) -> Optional[Event]:
+    """Build one Event from a getUpdates/item or webhook payload; None if unknown type or not an object."""
+    if not isinstance(update_json, dict):
+        return None
+    for key, payload in update_json.items():
+        extract = _EXTRACTORS.get(key)
+        if extract is not None:
+            return extract(payload, update_json)
     return None
+
+
+def normalize_batch(updates: Iterable[dict], offset: int = 0) -> Tuple[List[Event], int]:
+    """Normalize a getUpdates page (or any list of updates) in one pass.
+
+    Returns the Events (unknown updates skipped) and the next offset: one past the highest
+    update_id seen, or the given offset if there is none.
+    """
+    events: List[Event] = []
+    append = events.append
+    extractor = _EXTRACTORS.get
+    for update in updates:
+        if not isinstance(update, dict):
+            continue
+        update_id = update.get("update_id")
+        if update_id is not None and update_id >= offset:
+            offset = update_id + 1
+        for key, payload in update.items():
+            extract = extractor(key)
+            if extract is not None:
+                event = extract(payload, update)
+                if event is not None:
+                    append(event)
+                break
+    return events, offset
@@ -13,11 +13,15 @@ class TelegramAPIError(ShingramError):
         error_code: Telegram error code
         description: Error description from Telegram
         method: API method that failed (without token)
+        parameters: ResponseParameters from Telegram (dict), if any
+        retry_after: Seconds to wait before retrying (set on 429 flood control)
     """
-    def __init__(self, error_code, description, method=None):
+    def __init__(self, error_code, description, method=None, parameters=None):
         self.error_code = error_code
         self.description = description
         self.method = method
+        self.parameters = parameters or {}
+        self.retry_after = self.parameters.get("retry_after")
         super().__init__(f"Telegram API error {error_code}: {description}")
 
 
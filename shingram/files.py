@@ -0,0 +1,222 @@
+"""File uploads: InputFile parameters are streamed as multipart, uploaded file_ids are cached."""
+
+import hashlib
+import io
+import mimetypes
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Hashable, Optional, Tuple, Union
+from . import codec
+from .utils import reset_after_fork
+
+_HASH_CHUNK = 1 << 16
+
+
+class InputFile:
+    """A local file to send: a path or a binary file-like object, streamed in chunks (never read whole).
+
+    Paths are cached by path, size and mtime, seekable streams by a hash of their content;
+    cache_key overrides both.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, os.PathLike, BinaryIO],
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        cache_key: Optional[Hashable] = None,
+    ):
+        if isinstance(file, (str, os.PathLike)):
+            self.path: Optional[str] = os.fspath(file)
+            self.stream: Optional[BinaryIO] = None
+        else:
+            self.path = None
+            self.stream = file
+        self.filename = filename or os.path.basename(self.path or getattr(file, "name", "") or "file")
+        self.content_type = content_type or mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+        self.cache_key = cache_key
+
+    def stat_key(self) -> Optional[str]:
+        """Key from the file's real path, size and mtime (cheap; changes when the file is rewritten)."""
+        if self.path is None:
+            return None
+        st = os.stat(self.path)
+        return f"path:{os.path.realpath(self.path)}:{st.st_size}:{st.st_mtime_ns}"
+
+    def content_hash(self) -> Optional[str]:
+        """sha256 of the content, read in chunks; None for streams that can't seek back."""
+        digest = hashlib.sha256()
+        if self.path is not None:
+            with open(self.path, "rb") as f:
+                for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                    digest.update(chunk)
+        else:
+            stream = self.stream
+            if not (hasattr(stream, "seekable") and stream.seekable()):
+                return None
+            start = stream.tell()
+            stream.seek(0)  # httpx uploads from the beginning too
+            for chunk in iter(lambda: stream.read(_HASH_CHUNK), b""):
+                digest.update(chunk)
+            stream.seek(start)
+        return f"sha256:{digest.hexdigest()}"
+
+    def open(self) -> Tuple[BinaryIO, bool]:
+        """File object to stream from, and whether the caller must close it."""
+        if self.path is not None:
+            return open(self.path, "rb"), True
+        return self.stream, False
+
+
+# One isinstance check per parameter keeps the plain JSON path cheap.
+_UPLOAD_TYPES = (InputFile, os.PathLike, io.IOBase)
+
+
+def find_uploads(params: dict) -> Dict[str, InputFile]:
+    """Parameters that are local files (InputFile, pathlib.Path or open binary file)."""
+    uploads = {}
+    for name, value in params.items():
+        if isinstance(value, _UPLOAD_TYPES):
+            uploads[name] = value if isinstance(value, InputFile) else InputFile(value)
+    return uploads
+
+
+def form_fields(params: dict, uploads: Dict[str, InputFile]) -> dict:
+    """Non-file parameters as multipart form fields (JSON-encoded unless already str)."""
+    return {
+        name: value if isinstance(value, str) else codec.dumps(value)
+        for name, value in params.items()
+        if name not in uploads
+    }
+
+
+def file_id_from_result(result, name: str) -> Optional[str]:
+    """file_id Telegram assigned to the file sent as parameter `name` (largest size for photos)."""
+    media = result.get(name) if isinstance(result, dict) else None
+    if isinstance(media, list) and media:
+        media = media[-1]
+    if isinstance(media, dict):
+        return media.get("file_id")
+    return None
+
+
+class SQLiteFileIdStore:
+    """file_id table in an SQLite database, so cached ids survive restarts and are shared by processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS file_ids (key TEXT PRIMARY KEY, file_id TEXT NOT NULL)")
+        self._db.commit()
+        self._inherited = []
+        reset_after_fork(self)
+
+    def _reset_after_fork(self):
+        # Handlers in forked webhook workers need their own connection; the parent's is kept, unused.
+        self._inherited.append(self._db)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT file_id FROM file_ids WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, file_id: str):
+        self._db.execute("INSERT OR REPLACE INTO file_ids (key, file_id) VALUES (?, ?)", (key, file_id))
+        self._db.commit()
+
+    def delete(self, key: str):
+        self._db.execute("DELETE FROM file_ids WHERE key = ?", (key,))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+class FileIdCache:
+    """Uploaded file key -> Telegram file_id: in-memory LRU, optionally backed by a persistent store.
+
+    store: an SQLite file path, or any object with get/set/delete (keys passed as str). Misses
+    in memory fall through to the store; new ids are written to both.
+    by_content=True keys path uploads by content hash too, so copies of a file share one id.
+    Keys include the parameter the file is sent as: a file_id Telegram gave a photo isn't accepted
+    as a document, so the same file sent both ways is cached once per kind.
+    """
+
+    def __init__(self, max_size: int = 1024, store=None, by_content: bool = False):
+        self.max_size = max_size
+        self.by_content = by_content
+        self.store = SQLiteFileIdStore(store) if isinstance(store, (str, os.PathLike)) else store
+        self._ids: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key_for(self, upload: InputFile, name: str = "") -> Optional[Hashable]:
+        """Cache key for an upload sent as parameter `name` (photo, document, ...), or None if it can't be identified."""
+        if upload.cache_key is not None:
+            key = upload.cache_key
+        elif upload.path is not None and not self.by_content:
+            key = upload.stat_key()
+        else:
+            key = upload.content_hash()
+        if key is None or not name:
+            return key
+        return f"{name}:{key}" if isinstance(key, str) else (name, key)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            file_id = self._ids.get(key)
+            if file_id is not None:
+                self._ids.move_to_end(key)
+                return file_id
+            if self.store is not None:
+                file_id = self.store.get(str(key))
+                if file_id is not None:
+                    self._put(key, file_id)
+            return file_id
+
+    def set(self, key: Hashable, file_id: str):
+        with self._lock:
+            self._put(key, file_id)
+            if self.store is not None:
+                self.store.set(str(key), file_id)
+
+    def discard(self, key: Hashable):
+        """Forget a file_id Telegram no longer accepts."""
+        with self._lock:
+            self._ids.pop(key, None)
+            if self.store is not None:
+                self.store.delete(str(key))
+
+    def _put(self, key: Hashable, file_id: str):
+        self._ids[key] = file_id
+        self._ids.move_to_end(key)
+        if len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def substitute(self, params: dict, uploads: Dict[str, InputFile]):
+        """Swap uploads seen before for their file_id: (params, uploads still to send, keys by name)."""
+        keys, pending = {}, {}
+        for name, upload in uploads.items():
+            key = keys[name] = self.key_for(upload, name)
+            file_id = self.get(key) if key is not None else None
+            if file_id is None:
+                pending[name] = upload
+            else:
+                params = {**params, name: file_id}
+        return params, pending, keys
+
+    def remember(self, keys: dict, pending: Dict[str, InputFile], result):
+        """Store the file_ids Telegram assigned to the files just uploaded."""
+        for name in pending:
+            key = keys[name]
+            file_id = file_id_from_result(result, name)
+            if key is not None and file_id is not None:
+                self.set(key, file_id)
+
+    def close(self):
+        if self.store is not None and hasattr(self.store, "close"):
+            self.store.close()
+
+    def __len__(self) -> int:
+        return len(self._ids)
@@ -0,0 +1,242 @@
+"""Fire-and-forget outbound calls: queued API calls run in the background, in order per chat.
+
+Queued calls that haven't started yet are coalesced: a newer edit of the same message replaces the
+pending one, and with merge_window > 0 bursts of plain text sends to a chat become one message.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+from .utils import report_error, snake_to_camel
+
+_MERGEABLE = frozenset(("chat_id", "text", "parse_mode"))
+_MAX_TEXT = 4096
+
+
+class _Call:
+    __slots__ = ("method", "params", "key", "due", "future")
+
+    def __init__(self, method: str, params: dict, key: Optional[tuple], due: float):
+        self.method = method
+        self.params = params
+        self.key = key
+        self.due = due
+        self.future = None
+
+
+class _Coalescer:
+    """Calls queued but not started, by what later calls can fold into (same edited message, same chat's text)."""
+
+    def __init__(self, merge_window: float):
+        self.merge_window = merge_window
+        self._open: Dict[tuple, _Call] = {}
+
+    def _key(self, method: str, params: dict) -> Optional[tuple]:
+        if method.startswith("edit"):
+            return (method, params.get("inline_message_id") or (params.get("chat_id"), params.get("message_id")))
+        if self.merge_window and method == "sendMessage" and params.keys() <= _MERGEABLE:
+            return ("merge", params.get("chat_id"))
+        return None
+
+    def take(self, method: str, params: dict) -> Tuple[_Call, bool]:
+        """The pending call this one folds into, or a new call; and whether it is new."""
+        key = self._key(method, params)
+        if key is None:
+            # Anything else sent to the chat closes its merge, so later texts can't overtake it.
+            self._open.pop(("merge", params.get("chat_id")), None)
+            return _Call(method, params, None, 0.0), True
+        pending = self._open.get(key)
+        if pending is not None:
+            if key[0] != "merge":
+                pending.params = params  # the latest edit wins
+                return pending, False
+            text = f"{pending.params['text']}\n{params['text']}"
+            if pending.params.get("parse_mode") == params.get("parse_mode") and len(text) <= _MAX_TEXT:
+                pending.params = {**pending.params, "text": text}
+                return pending, False
+        due = time.monotonic() + self.merge_window if self.merge_window else 0.0
+        call = self._open[key] = _Call(method, params, key, due)
+        return call, True
+
+    def start(self, call: _Call):
+        """call is about to be sent: nothing can fold into it any more."""
+        if call.key is not None and self._open.get(call.key) is call:
+            del self._open[call.key]
+
+
+class SendQueue:
+    """Background send queue for a Client: client.enqueue.send_message(...) returns a Future at once.
+
+    Calls run on `workers` threads; calls with the same chat_id go to the same worker, so they are
+    sent in order. A failed call sets the exception on its future and is passed to on_error (printed
+    when there is none). Each worker buffers up to queue_size calls; submitting blocks while it is full.
+
+    An edit of a message that already has an edit waiting replaces it (both futures get the one
+    result). With merge_window=seconds, edits and plain sendMessage calls (only chat_id, text,
+    parse_mode) wait that long before sending, and texts sent to the same chat meanwhile are joined
+    with newlines into one message, up to Telegram's 4096 characters.
+    """
+
+    def __init__(
+        self,
+        client,
+        workers: int = 4,
+        queue_size: int = 1000,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        merge_window: float = 0.0,
+    ):
+        self.client = client
+        self.workers = workers
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self._coalescer = _Coalescer(merge_window)
+        self._queues: Optional[List[queue.Queue]] = None
+        self._threads: List[threading.Thread] = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _start(self) -> List[queue.Queue]:
+        # Threads start on first use, so an unused queue costs nothing.
+        with self._lock:
+            if self._queues is None:
+                queues = [queue.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+                self._threads = [
+                    threading.Thread(target=self._work, args=(q,), name=f"shingram-sender-{i}", daemon=True)
+                    for i, q in enumerate(queues)
+                ]
+                for thread in self._threads:
+                    thread.start()
+                self._queues = queues
+            return self._queues
+
+    def submit(self, method: str, **params) -> Future:
+        """Queue client.call(method, **params); the future resolves to its result."""
+        queues = self._queues or self._start()
+        with self._lock:
+            call, new = self._coalescer.take(method, params)
+            if not new:
+                return call.future
+            call.future = Future()
+        chat_id = params.get("chat_id")
+        if chat_id is None:
+            self._next = index = (self._next + 1) % len(queues)
+        else:
+            index = hash(chat_id) % len(queues)
+        queues[index].put(call)
+        return call.future
+
+    def _work(self, calls: queue.Queue):
+        while True:
+            call = calls.get()
+            if call is None:
+                return
+            if call.due:
+                time.sleep(max(0.0, call.due - time.monotonic()))
+            with self._lock:
+                self._coalescer.start(call)
+            future = call.future
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.client.call(call.method, **call.params))
+            except Exception as e:
+                future.set_exception(e)
+                report_error(e, self.on_error, "send queue")
+
+    @property
+    def pending(self) -> int:
+        """Calls queued but not yet started."""
+        return sum(q.qsize() for q in self._queues or ())
+
+    def close(self):
+        """Send everything already queued, then stop the workers."""
+        with self._lock:
+            queues, threads = self._queues, self._threads
+            self._queues, self._threads = None, []
+        for calls in queues or ():
+            calls.put(None)
+        for thread in threads:
+            thread.join()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = partial(self.submit, snake_to_camel(name))
+        self.__dict__[name] = method
+        return method
+
+
+class AsyncSendQueue:
+    """Async counterpart of SendQueue: async_client.enqueue.send_message(...) returns a Task at once.
+
+    Must be used inside the running event loop. Up to `concurrency` calls are in flight; calls with
+    the same chat_id run in order. Coalescing and merge_window work as in SendQueue.
+    """
+
+    def __init__(
+        self,
+        client,
+        concurrency: int = 4,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        merge_window: float = 0.0,
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.on_error = on_error
+        self._coalescer = _Coalescer(merge_window)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tails: Dict[object, asyncio.Task] = {}
+        self._tasks = set()
+
+    def submit(self, method: str, **params) -> asyncio.Task:
+        """Schedule client.call_async(method, **params); the task resolves to its result."""
+        call, new = self._coalescer.take(method, params)
+        if not new:
+            return call.future
+        key = params.get("chat_id")
+        previous = self._tails.get(key) if key is not None else None
+        task = call.future = asyncio.ensure_future(self._send(previous, call))
+        self._tasks.add(task)
+        if key is not None:
+            self._tails[key] = task
+        task.add_done_callback(lambda t: self._done(t, key))
+        return task
+
+    async def _send(self, previous: Optional[asyncio.Task], call: _Call):
+        if previous is not None:
+            await asyncio.wait((previous,))
+        if call.due:
+            await asyncio.sleep(max(0.0, call.due - time.monotonic()))
+        async with self._slots:
+            self._coalescer.start(call)
+            return await self.client.call_async(call.method, **call.params)
+
+    def _done(self, task: asyncio.Task, key):
+        self._tasks.discard(task)
+        if key is not None and self._tails.get(key) is task:
+            del self._tails[key]
+        if not task.cancelled() and task.exception() is not None:
+            report_error(task.exception(), self.on_error, "send queue")
+
+    @property
+    def pending(self) -> int:
+        """Calls scheduled but not finished."""
+        return len(self._tasks)
+
+    async def drain(self):
+        """Wait for all scheduled calls to finish."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        # A fresh semaphore, in case the next run uses another event loop.
+        self._slots = asyncio.Semaphore(self.concurrency)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = partial(self.submit, snake_to_camel(name))
+        self.__dict__[name] = method
+        return method
@@ -0,0 +1,144 @@
+"""Outbound rate limiting: token buckets for global, per-chat and per-group send limits, plus 429 retry_after."""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar, Union
+from .exceptions import TelegramAPIError
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Token bucket (GCRA form): `rate` tokens per second, bursts of up to `burst` tokens."""
+
+    __slots__ = ("interval", "tolerance", "tat")
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self.tat = 0.0  # theoretical arrival time of the next token
+
+    def ready_at(self, now: float) -> float:
+        """Earliest time a token can be taken."""
+        return max(self.tat, now) - self.tolerance
+
+    def take(self, at: float):
+        self.tat = max(self.tat, at) + self.interval
+
+    def idle(self, now: float) -> bool:
+        """True once the bucket is full again, i.e. indistinguishable from a new one."""
+        return self.tat <= now
+
+
+class RateLimiter:
+    """Schedules send-type API calls within Telegram's limits; share one instance between clients.
+
+    Every limited call takes a token from the global bucket and from its chat's bucket (private
+    chats and groups have separate rates; negative or @username chat ids count as groups). Callers
+    wait their turn in reservation order. A 429 answer pauses all limited calls for retry_after
+    seconds and the call is retried up to max_retries times.
+
+    Defaults follow the Bot API FAQ: 30 messages/s overall, 1/s per chat, 20/min per group.
+    """
+
+    limited_prefixes = ("send", "forward", "copy", "edit")
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        global_burst: int = 30,
+        chat_rate: float = 1.0,
+        chat_burst: int = 3,
+        group_rate: float = 20 / 60,
+        group_burst: int = 3,
+        max_retries: int = 3,
+        max_chats: int = 10000,
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        self._paused_until = 0.0
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls currently waiting for their turn."""
+        return self._waiting
+
+    def applies(self, method: str) -> bool:
+        return method.startswith(self.limited_prefixes)
+
+    def reserve(self, chat_id: Optional[Union[int, str]] = None) -> float:
+        """Take a slot for one call to chat_id; returns how many seconds to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._paused_until, self._global.ready_at(now))
+            bucket = self._chat_bucket(chat_id, now) if chat_id is not None else None
+            if bucket is not None:
+                start = max(start, bucket.ready_at(now))
+                bucket.take(start)
+            self._global.take(start)
+            if start > now:
+                self._waiting += 1
+            return start - now
+
+    def _done_waiting(self):
+        with self._lock:
+            self._waiting -= 1
+
+    def pause(self, seconds: float):
+        """Hold back all limited calls for `seconds` (Telegram's retry_after)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _chat_bucket(self, chat_id: Union[int, str], now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                # Full buckets carry no state; dropping them keeps memory bounded.
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle(now)}
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def call(self, chat_id: Optional[Union[int, str]], send: Callable[[], T]) -> T:
+        """Run send() once its slot comes up (blocking), retrying after 429s."""
+        for attempt in range(self.max_retries + 1):
+            delay = self.reserve(chat_id)
+            if delay > 0:
+                try:
+                    time.sleep(delay)
+                finally:
+                    self._done_waiting()
+            try:
+                return send()
+            except TelegramAPIError as e:
+                if e.retry_after is None or attempt == self.max_retries:
+                    raise
+                self.pause(e.retry_after)
+
+    async def call_async(self, chat_id: Optional[Union[int, str]], send: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of call()."""
+        for attempt in range(self.max_retries + 1):
+            delay = self.reserve(chat_id)
+            if delay > 0:
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self._done_waiting()
+            try:
+                return await send()
+            except TelegramAPIError as e:
+                if e.retry_after is None or attempt == self.max_retries:
+                    raise
+                self.pause(e.retry_after)
@@ -1,66 +1,364 @@
 """Event routing: one handler list per pattern; dispatch and dispatch_async use the same matcher."""
 
 import asyncio
-from typing import Callable, Dict, List
+import inspect
+import re
+from typing import Callable, Dict, List, Optional, Pattern, Tuple, Union
 from .events import Event
+from .state import StateStore
 
+_REGEX_META = frozenset(".^$*+?{}[]\\|()")
+_OPTIONAL = frozenset("?*{")
 
-class Router:
-    """Maps event patterns to handlers; used by both sync and async runtimes."""
+
+def _literal_prefix(regex: Pattern) -> str:
+    """Literal text every match of regex (used with re.match) starts with; "" if unknown."""
+    pattern = regex.pattern
+    # Verbose patterns ignore whitespace and comments, so their text isn't a literal prefix.
+    if not isinstance(pattern, str) or regex.flags & (re.IGNORECASE | re.VERBOSE) or "|" in pattern:
+        return ""
+    prefix = []
+    i = 1 if pattern.startswith("^") else 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            literal, step = pattern[i + 1], 2
+        elif ch in _REGEX_META:
+            break
+        else:
+            literal, step = ch, 1
+        if pattern[i + step:i + step + 1] in _OPTIONAL:
+            break  # "a?" / "a*": the literal may be absent
+        prefix.append(literal)
+        i += step
+    return "".join(prefix)
+
+
+def _route_text(event: Event) -> str:
+    """What prefix and regex filters look at: the command name for commands, else event.text."""
+    text = event.name if event.type == "command" else event.text
+    return text if isinstance(text, str) else ""
+
+
+class _Route:
+    """A handler with filters; registration order decides the order handlers run in."""
+
+    __slots__ = ("order", "handler", "is_coroutine", "name", "prefix", "regex", "predicate", "state")
+
+    def __init__(self, order: int, handler: Callable, name: Optional[str], prefix: str, regex, predicate, state=None):
+        self.order = order
+        self.handler = handler
+        self.is_coroutine = asyncio.iscoroutinefunction(handler)
+        self.name = name
+        self.prefix = prefix
+        self.regex = re.compile(regex) if isinstance(regex, str) else regex
+        self.predicate = predicate
+        self.state = state
+
+    def matches(self, event: Event, text: str) -> bool:
+        # The prefix is already known to match: only candidates from the index get here.
+        if self.name is not None and event.name != self.name:
+            return False
+        if self.regex is not None and self.regex.match(text) is None:
+            return False
+        return self.predicate is None or bool(self.predicate(event))
+
+
+class _RouteIndex:
+    """Filtered routes of one event type: a trie over literal prefixes plus the routes it can't index."""
+
+    __slots__ = ("trie", "unindexed")
 
     def __init__(self):
+        self.trie: dict = {}
+        self.unindexed: List[_Route] = []
+
+    def add(self, route: _Route):
+        prefix = route.prefix
+        if route.regex is not None:
+            # prefix= and the regex's own literal prefix both have to match; index the longer one.
+            literal = _literal_prefix(route.regex)
+            if literal.startswith(prefix):
+                prefix = literal
+        if not prefix:
+            self.unindexed.append(route)
+            return
+        node = self.trie
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node.setdefault("", []).append(route)  # "" never clashes with a one-character key
+
+    def candidates(self, text: str) -> List[_Route]:
+        """Routes whose indexed prefix text starts with, plus unindexed ones, in registration order."""
+        found = list(self.unindexed)
+        node = self.trie
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                break
+            here = node.get("")
+            if here:
+                found.extend(here)
+        if len(found) > 1:
+            found.sort(key=lambda route: route.order)
+        return found
+
+    def matching(self, event: Event) -> List[_Route]:
+        text = _route_text(event)
+        return [route for route in self.candidates(text) if route.matches(event, text)]
+
+
+def _compile_routes(routes: List[Tuple[str, _Route]]) -> Tuple[Dict[str, _RouteIndex], Dict[str, Dict[str, _RouteIndex]]]:
+    """(indexes of stateless routes by type, {state: indexes of that state's routes by type})."""
+    index: Dict[str, _RouteIndex] = {}
+    by_state: Dict[str, Dict[str, _RouteIndex]] = {}
+    for event_type, route in routes:
+        target = index if route.state is None else by_state.setdefault(route.state, {})
+        target.setdefault(event_type, _RouteIndex()).add(route)
+    return index, by_state
+
+
+def _matches(index: Dict[str, _RouteIndex], event: Event) -> Tuple[List[_Route], List[_Route]]:
+    """(matching "*" routes, matching routes of the event's type) in one set of indexes."""
+    anything = index.get("*")
+    typed = index.get(event.type)
+    return (
+        anything.matching(event) if anything is not None else [],
+        typed.matching(event) if typed is not None else [],
+    )
+
+
+def _compile_plan(handlers: Dict[str, List[Callable]], wrap: Callable) -> tuple:
+    """Freeze patterns into (wildcard, {type: (type_handlers, {name: name_handlers})}); wrap maps each handler."""
+    wildcard = tuple(wrap(h) for h in handlers.get("*", ()))
+    by_type: Dict[str, Tuple[tuple, Dict[str, tuple]]] = {}
+    for pattern, pattern_handlers in handlers.items():
+        if pattern == "*":
+            continue
+        event_type, sep, name = pattern.partition(":")
+        typed, named = by_type.get(event_type, ((), {}))
+        wrapped = tuple(wrap(h) for h in pattern_handlers)
+        if sep:
+            named[name] = wrapped
+        else:
+            typed = wrapped
+        by_type[event_type] = (typed, named)
+    return wildcard, by_type
+
+
+def _chain(middlewares: List[Callable], endpoint: Callable) -> Callable:
+    """Nest middlewares around endpoint: the first registered runs outermost."""
+    call = endpoint
+    for middleware in reversed(middlewares):
+        call = _link(middleware, call)
+    return call
+
+
+def _link(middleware: Callable, call_next: Callable) -> Callable:
+    def call(event: Event):
+        return middleware(event, call_next)
+    return call
+
+
+def _chain_async(middlewares: List[Callable], endpoint: Callable) -> Callable:
+    call = endpoint
+    for middleware in reversed(middlewares):
+        call = _link_async(middleware, call)
+    return call
+
+
+def _link_async(middleware: Callable, call_next: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(middleware):
+        async def call(event: Event):
+            return await middleware(event, call_next)
+    else:
+        async def call(event: Event):
+            # A sync middleware returns call_next(event), i.e. the coroutine to await.
+            result = middleware(event, call_next)
+            if inspect.isawaitable(result):
+                return await result
+            return result
+    return call
+
+
+def _with_coroutine_flag(handler: Callable) -> Tuple[Callable, bool]:
+    return handler, asyncio.iscoroutinefunction(handler)
+
+
+async def _call_all_async(handlers: tuple, event: Event):
+    for handler, is_coroutine in handlers:
+        if is_coroutine:
+            await handler(event)
+        else:
+            handler(event)
+
+
+class Router:
+    """Maps event patterns to handlers; used by both sync and async runtimes.
+
+    Patterns are compiled into a dispatch plan on registration, so dispatch does no string
+    building or coroutine checks per event.
+
+    Handlers registered with filters (prefix=, regex=, predicate=) match on the command name for
+    commands and on event.text otherwise (callback data, message text). They are indexed by event
+    type and literal prefix, so only candidates are checked. For an event, all matching filtered
+    handlers of its type run (in registration order) instead of its "type:name" or "type"
+    handlers; filtered "*" handlers run in addition to them.
+
+    state= registers a handler for one conversation state (see StateStore, kept in .states); for
+    a chat and user in that state, matching state handlers run instead of the stateless ones.
+
+    Middleware (router.use) wraps dispatch: middleware(event, call_next) may change the event,
+    skip call_next to stop it, or time it. The chain is compiled on registration; without
+    middleware, dispatch is the plain matcher.
+    """
+
+    def __init__(self, states: Optional[StateStore] = None):
         self.handlers: Dict[str, List[Callable]] = {}
+        self.routes: List[Tuple[str, _Route]] = []
+        self.middlewares: List[Callable] = []
+        self.states = states
+        self._compile()
+
+    def use(self, middleware: Callable):
+        """Add middleware(event, call_next) after those already added; usable as a decorator.
+
+        dispatch needs sync middleware; dispatch_async takes both (async ones await call_next(event)).
+        """
+        self.middlewares.append(middleware)
+        self._compile()
+        return middleware
 
-    def on(self, event_name: str, handler: Callable = None):
+    def on(
+        self,
+        event_name: str,
+        handler: Callable = None,
+        *,
+        prefix: str = "",
+        regex: Union[str, Pattern, None] = None,
+        predicate: Optional[Callable[[Event], bool]] = None,
+        state: Optional[str] = None,
+    ):
+        """Register handler; decorator or router.on(name, fn). Filters: prefix, regex (re.match), predicate(event), state."""
         if handler is None:
             def decorator(func: Callable):
-                self._register(event_name, func)
+                self._register(event_name, func, prefix, regex, predicate, state)
                 return func
             return decorator
-        
-        self._register(event_name, handler)
+
+        self._register(event_name, handler, prefix, regex, predicate, state)
         return handler
-    
-    def _register(self, event_name: str, handler: Callable):
-        if event_name not in self.handlers:
-            self.handlers[event_name] = []
-        self.handlers[event_name].append(handler)
-    
+
+    def _register(self, event_name: str, handler: Callable, prefix: str = "", regex=None, predicate=None, state=None):
+        if prefix or regex is not None or predicate is not None or state is not None:
+            if state is not None and self.states is None:
+                self.states = StateStore()
+            event_type, sep, name = event_name.partition(":")
+            route = _Route(len(self.routes), handler, name if sep else None, prefix, regex, predicate, state)
+            self.routes.append((event_type, route))
+        else:
+            if event_name not in self.handlers:
+                self.handlers[event_name] = []
+            self.handlers[event_name].append(handler)
+        self._compile()
+
+    def _compile(self):
+        self._plan = _compile_plan(self.handlers, lambda h: h)
+        self._async_plan = _compile_plan(self.handlers, _with_coroutine_flag)
+        self._index, self._state_index = _compile_routes(self.routes)
+        if self.middlewares:
+            self._dispatch = _chain(self.middlewares, self._route)
+            self._dispatch_async = _chain_async(self.middlewares, self._route_async)
+        else:
+            self._dispatch = self._route
+            self._dispatch_async = self._route_async
+
+    def __getstate__(self):
+        # The plan is rebuilt from handlers on unpickling (e.g. in webhook worker processes).
+        return {"handlers": self.handlers, "routes": self.routes, "states": self.states, "middlewares": self.middlewares}
+
+    def __setstate__(self, state):
+        self.handlers = state["handlers"]
+        self.routes = state.get("routes", [])
+        self.states = state.get("states")
+        self.middlewares = state.get("middlewares", [])
+        self._compile()
+
     def dispatch(self, event: Event):
-        if "*" in self.handlers:
-            for handler in self.handlers["*"]:
-                handler(event)
-        
+        """Run middleware, then matching handlers."""
+        return self._dispatch(event)
+
+    async def dispatch_async(self, event: Event):
+        """Same as dispatch; awaits handlers and middleware that are coroutines."""
+        return await self._dispatch_async(event)
+
+    def _route(self, event: Event):
+        wildcard, by_type = self._plan
+        for handler in wildcard:
+            handler(event)
+
+        if self.routes and self._dispatch_routes(event):
+            return
+        entry = by_type.get(event.type)
+        if entry is None:
+            return
+        typed, named = entry
         if event.name:
-            specific_name = f"{event.type}:{event.name}"
-            if specific_name in self.handlers:
-                for handler in self.handlers[specific_name]:
+            specific = named.get(event.name)
+            if specific is not None:
+                for handler in specific:
                     handler(event)
                 return
-        if event.type in self.handlers:
-            for handler in self.handlers[event.type]:
-                handler(event)
+        for handler in typed:
+            handler(event)
 
-    async def dispatch_async(self, event: Event):
-        """Same matching as dispatch; awaits handlers that are coroutines."""
-        if "*" in self.handlers:
-            for handler in self.handlers["*"]:
-                if asyncio.iscoroutinefunction(handler):
-                    await handler(event)
-                else:
-                    handler(event)
+    async def _route_async(self, event: Event):
+        """Same matching as _route; awaits handlers that are coroutines."""
+        wildcard, by_type = self._async_plan
+        if wildcard:
+            await _call_all_async(wildcard, event)
+
+        if self.routes and await self._dispatch_routes_async(event):
+            return
+        entry = by_type.get(event.type)
+        if entry is None:
+            return
+        typed, named = entry
         if event.name:
-            specific_name = f"{event.type}:{event.name}"
-            if specific_name in self.handlers:
-                for handler in self.handlers[specific_name]:
-                    if asyncio.iscoroutinefunction(handler):
-                        await handler(event)
-                    else:
-                        handler(event)
+            specific = named.get(event.name)
+            if specific is not None:
+                await _call_all_async(specific, event)
                 return
-        if event.type in self.handlers:
-            for handler in self.handlers[event.type]:
-                if asyncio.iscoroutinefunction(handler):
-                    await handler(event)
-                else:
-                    handler(event)
+        await _call_all_async(typed, event)
+
+    def _matching_routes(self, event: Event) -> Tuple[List[_Route], List[_Route]]:
+        """(matching filtered "*" routes, matching filtered routes of the event's type)."""
+        anything, typed = _matches(self._index, event)
+        if self._state_index:
+            state_index = self._state_index.get(self.states.get(event))
+            if state_index is not None:
+                state_anything, state_typed = _matches(state_index, event)
+                if state_anything:
+                    anything = sorted(anything + state_anything, key=lambda route: route.order)
+                if state_typed:
+                    typed = state_typed
+        return anything, typed
+
+    def _dispatch_routes(self, event: Event) -> bool:
+        """Run matching filtered handlers; True if typed ones matched (plain handlers are skipped)."""
+        anything, typed = self._matching_routes(event)
+        for route in anything:
+            route.handler(event)
+        for route in typed:
+            route.handler(event)
+        return bool(typed)
+
+    async def _dispatch_routes_async(self, event: Event) -> bool:
+        anything, typed = self._matching_routes(event)
+        for route in anything + typed:
+            if route.is_coroutine:
+                await route.handler(event)
+            else:
+                route.handler(event)
+        return bool(typed)
+
@@ -1,19 +1,215 @@
-"""Long polling runtimes; both use the same normalize() and Router (shared core)."""
+"""Long polling runtimes; both use the same normalize_batch() and Router (shared core)."""
 
 import asyncio
+import math
+import queue
+import threading
 import time
-from typing import Callable, List, Optional
-from .client import Client, AsyncClient
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from .client import Client, AsyncClient, RetryPolicy
 from .router import Router
-from .events import normalize
+from .dedup import UpdateDeduplicator
+from .events import Event, normalize_batch, _ordering_key
+from .throttle import Throttle
+from .utils import report_error
+
+
+def _dispatch_all(events: List[Event], dispatch: Callable[[Event], None], on_error, where: str):
+    # The batch's offset is already taken; a failing handler is reported and the rest still runs.
+    for event in events:
+        try:
+            dispatch(event)
+        except Exception as e:
+            report_error(e, on_error, where)
+
+
+async def _dispatch_all_async(events: List[Event], dispatch: Callable[[Event], Awaitable], on_error, where: str):
+    for event in events:
+        try:
+            await dispatch(event)
+        except Exception as e:
+            report_error(e, on_error, where)
+
+
+def _poll_params(params: dict, throttle: Optional[Throttle]) -> dict:
+    """Shorten the long poll so delayed (throttled) events are released on time."""
+    wait = throttle.next_due() if throttle is not None else None
+    if wait is None:
+        return params
+    return {**params, "timeout": min(params["timeout"], math.ceil(wait))}
+
+
+def _normalize(updates: list, offset: int, dedup: Optional[UpdateDeduplicator]) -> Tuple[List[Event], int]:
+    """normalize_batch without updates already handled; the offset still moves past them.
+
+    Fresh ids are only checked here: _recording() records each one after its handlers ran, so a crash
+    mid-batch leaves the rest to be dispatched when Telegram hands the batch out again.
+    """
+    if dedup is None:
+        return normalize_batch(updates, offset)
+    fresh = dedup.filter(updates, record=False)
+    events, offset = normalize_batch(fresh, offset)
+    if len(fresh) < len(updates):
+        offset = max(offset, max((u.get("update_id", -1) for u in updates), default=-1) + 1)
+    return events, offset
+
+
+def _record(dedup: UpdateDeduplicator, event: Event):
+    update_id = event.raw.get("update_id")
+    if update_id is not None:
+        dedup.record(update_id)
+
+
+def _recording(dispatch: Callable[[Event], None], dedup: Optional[UpdateDeduplicator]) -> Callable[[Event], None]:
+    """dispatch, then record the event's update as handled (even if a handler raised, not if interrupted)."""
+    if dedup is None:
+        return dispatch
+
+    def run(event: Event):
+        try:
+            dispatch(event)
+        except Exception:
+            _record(dedup, event)
+            raise
+        _record(dedup, event)
+
+    return run
+
+
+def _recording_async(dispatch: Callable[[Event], Awaitable], dedup: Optional[UpdateDeduplicator]):
+    if dedup is None:
+        return dispatch
+
+    async def run(event: Event):
+        try:
+            await dispatch(event)
+        except Exception:
+            _record(dedup, event)
+            raise
+        _record(dedup, event)
+
+    return run
+
+
+def _put_until_stopped(batches: queue.Queue, item, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+
+class _ThreadDispatcher:
+    """Worker threads with one bounded queue each; events are sharded by ordering key so each chat stays in order."""
+
+    def __init__(
+        self,
+        dispatch: Callable[[Event], None],
+        workers: int,
+        queue_size: int,
+        on_error: Optional[Callable[[BaseException], None]],
+    ):
+        self.dispatch = dispatch
+        self.on_error = on_error
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._work, args=(q,), name=f"shingram-worker-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        self._next = 0
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, event: Event):
+        key = _ordering_key(event)
+        if key is None:
+            self._next = index = (self._next + 1) % len(self._queues)
+        else:
+            index = hash(key) % len(self._queues)
+        # Blocks while the worker's queue is full: backpressure on the polling loop.
+        self._queues[index].put(event)
+
+    def _work(self, events: queue.Queue):
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            try:
+                self.dispatch(event)
+            except Exception as e:
+                report_error(e, self.on_error, "handler")
+
+    def close(self):
+        """Let workers finish queued events, then stop them."""
+        for events in self._queues:
+            events.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class _TaskDispatcher:
+    """Runs each event as a task: at most `limit` handlers running, events with the same ordering key in order.
+
+    At most max_pending (default 10 * limit) events are submitted and not finished; beyond that
+    submit() waits. A task waiting for its chat's previous event holds no running slot, so one busy
+    chat can't hold up the others.
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[Event], Awaitable],
+        limit: int,
+        on_error: Optional[Callable[[BaseException], None]],
+        max_pending: Optional[int] = None,
+    ):
+        self.dispatch = dispatch
+        self.on_error = on_error
+        self._slots = asyncio.Semaphore(limit)
+        self._pending = asyncio.Semaphore(max_pending or 10 * limit)
+        self._tails: Dict[object, asyncio.Task] = {}
+        self._tasks = set()
+
+    async def submit(self, event: Event):
+        # Waiting here (not inside the task) is the backpressure on the polling loop.
+        await self._pending.acquire()
+        key = _ordering_key(event)
+        previous = self._tails.get(key) if key is not None else None
+        task = asyncio.create_task(self._run(event, previous))
+        self._tasks.add(task)
+        if key is not None:
+            self._tails[key] = task
+        task.add_done_callback(lambda t: self._done(t, key))
+
+    async def _run(self, event: Event, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait((previous,))
+        async with self._slots:
+            await self.dispatch(event)
+
+    def _done(self, task: asyncio.Task, key):
+        self._pending.release()
+        self._tasks.discard(task)
+        if key is not None and self._tails.get(key) is task:
+            del self._tails[key]
+        if not task.cancelled() and task.exception() is not None:
+            report_error(task.exception(), self.on_error, "async handler")
+
+    async def drain(self):
+        """Wait for all submitted events to finish."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
 
 
 class Runtime:
-    """Sync long-polling loop: getUpdates -> normalize -> dispatch."""
+    """Sync long-polling loop: getUpdates -> normalize_batch -> dispatch."""
 
-    def __init__(self, client: Client, router: Router):
+    def __init__(self, client: Client, router: Router, retry: Optional[RetryPolicy] = None):
         self.client = client
         self.router = router
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.throttle: Optional[Throttle] = None
+        self.dedup: Optional[UpdateDeduplicator] = None
         self.offset = 0
 
     def run(
@@ -22,43 +218,118 @@ class Runtime:
         limit: int = 100,
         allowed_updates: Optional[List[str]] = None,
         on_error: Optional[Callable[[BaseException], None]] = None,
+        workers: Optional[int] = None,
+        queue_size: int = 100,
+        prefetch: int = 0,
+        throttle: Optional[Throttle] = None,
+        dedup: Optional[UpdateDeduplicator] = None,
     ):
+        """Poll and dispatch. With workers=N, handlers run on N threads while polling continues.
+
+        Updates from the same chat go to the same worker, so they stay in order; each worker queues
+        at most queue_size updates before polling waits. With prefetch=N, the next getUpdates is sent
+        as soon as a batch arrives and up to N fetched batches wait for dispatch; those updates are
+        already confirmed to Telegram, so a crash loses them. throttle drops, delays or collapses
+        floods from single users before dispatch (see Throttle). dedup (with a store) skips updates a
+        previous run already handled when Telegram hands them out again after a restart; ids are
+        recorded once their handlers ran (see UpdateDeduplicator).
+        """
+        self.throttle = throttle
+        self.dedup = dedup
+        params = {"timeout": timeout, "limit": limit}
+        if allowed_updates is not None:
+            params["allowed_updates"] = allowed_updates
+        handle = _recording(self.router.dispatch, dedup)
+        dispatcher = _ThreadDispatcher(handle, workers, queue_size, on_error) if workers else None
+        dispatch = handle if dispatcher is None else dispatcher.submit
+        try:
+            if prefetch:
+                self._run_pipelined(params, dispatch, on_error, prefetch)
+            else:
+                self._run(params, dispatch, on_error)
+        finally:
+            if dispatcher is not None:
+                dispatcher.close()
+            self.client.close()
+
+    def _get_updates(self, params: dict) -> list:
+        updates = self.client.call("getUpdates", offset=self.offset, **params)
+        return updates if isinstance(updates, list) else []
+
+    def _fetch(self, params: dict) -> List[Event]:
+        """Next batch of events to dispatch: advances the offset, drops redeliveries, applies the throttle."""
+        throttle = self.throttle
+        updates = self._get_updates(_poll_params(params, throttle))
+        events, self.offset = _normalize(updates, self.offset, self.dedup)
+        return events if throttle is None else throttle.admit(events)
+
+    def _run(self, params: dict, dispatch: Callable[[Event], None], on_error):
+        failures = 0
+        while True:
+            try:
+                events = self._fetch(params)
+                failures = 0
+                _dispatch_all(events, dispatch, on_error, "polling loop")
+            except KeyboardInterrupt:
+                break
+            except TimeoutError:
+                continue
+            except Exception as e:
+                failures += 1
+                report_error(e, on_error, "polling loop")
+                time.sleep(self.retry.wait(failures))
+
+    def _run_pipelined(self, params: dict, dispatch: Callable[[Event], None], on_error, prefetch: int):
+        batches: queue.Queue = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        fetcher = threading.Thread(
+            target=self._fetch_loop, args=(params, batches, stop, on_error), name="shingram-fetcher", daemon=True
+        )
+        fetcher.start()
         try:
             while True:
-                try:
-                    params = {"offset": self.offset, "timeout": timeout, "limit": limit}
-                    if allowed_updates is not None:
-                        params["allowed_updates"] = allowed_updates
-                    updates = self.client.call("getUpdates", **params)
-                    if not isinstance(updates, list):
-                        updates = []
-                    for update in updates:
-                        update_id = update.get("update_id")
-                        if update_id is not None:
-                            self.offset = update_id + 1
-                        event = normalize(update)
-                        if event:
-                            self.router.dispatch(event)
-                except KeyboardInterrupt:
+                events = batches.get()
+                if events is None:
                     break
+                _dispatch_all(events, dispatch, on_error, "polling loop")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+
+    def _fetch_loop(self, params: dict, batches: queue.Queue, stop: threading.Event, on_error):
+        """Fetcher thread: long-polls continuously, advancing the offset as soon as a batch arrives."""
+        failures = 0
+        try:
+            while not stop.is_set():
+                try:
+                    events = self._fetch(params)
                 except TimeoutError:
                     continue
                 except Exception as e:
-                    if callable(on_error):
-                        on_error(e)
-                    else:
-                        print(f"Error in polling loop: {e}")
-                    time.sleep(1)
+                    if stop.is_set():
+                        return
+                    failures += 1
+                    report_error(e, on_error, "polling loop")
+                    stop.wait(self.retry.wait(failures))
+                    continue
+                failures = 0
+                if events:
+                    _put_until_stopped(batches, events, stop)
         finally:
-            self.client.close()
+            # Wake the dispatch loop if the fetcher dies on its own.
+            _put_until_stopped(batches, None, stop)
 
 
 class AsyncRuntime:
     """Async long-polling loop; same flow as Runtime, async client and dispatch."""
 
-    def __init__(self, client: AsyncClient, router: Router):
+    def __init__(self, client: AsyncClient, router: Router, retry: Optional[RetryPolicy] = None):
         self.client = client
         self.router = router
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.throttle: Optional[Throttle] = None
+        self.dedup: Optional[UpdateDeduplicator] = None
         self.offset = 0
 
     async def run_async(
@@ -67,32 +338,96 @@ class AsyncRuntime:
         limit: int = 100,
         allowed_updates: Optional[List[str]] = None,
         on_error: Optional[Callable[[BaseException], None]] = None,
+        concurrency: Optional[int] = None,
+        prefetch: int = 0,
+        throttle: Optional[Throttle] = None,
+        dedup: Optional[UpdateDeduplicator] = None,
     ):
+        """Poll and dispatch. With concurrency=N, updates run as tasks (at most N at once, in order per chat).
+
+        prefetch=N pipelines polling, throttle filters floods and dedup skips redeliveries, as in Runtime.run.
+        """
+        self.throttle = throttle
+        self.dedup = dedup
+        params = {"timeout": timeout, "limit": limit}
+        if allowed_updates is not None:
+            params["allowed_updates"] = allowed_updates
+        handle = _recording_async(self.router.dispatch_async, dedup)
+        dispatcher = _TaskDispatcher(handle, concurrency, on_error) if concurrency else None
+        dispatch = handle if dispatcher is None else dispatcher.submit
         try:
-            while True:
-                try:
-                    params = {"offset": self.offset, "timeout": timeout, "limit": limit}
-                    if allowed_updates is not None:
-                        params["allowed_updates"] = allowed_updates
-                    updates = await self.client.call_async("getUpdates", **params)
-                    if not isinstance(updates, list):
-                        updates = []
-                    for update in updates:
-                        update_id = update.get("update_id")
-                        if update_id is not None:
-                            self.offset = update_id + 1
-                        event = normalize(update)
-                        if event:
-                            await self.router.dispatch_async(event)
-                except asyncio.CancelledError:
-                    break
-                except TimeoutError:
-                    continue
-                except Exception as e:
-                    if callable(on_error):
-                        on_error(e)
-                    else:
-                        print(f"Error in async polling loop: {e}")
-                    await asyncio.sleep(1)
+            if prefetch:
+                await self._run_pipelined(params, dispatch, on_error, prefetch)
+            else:
+                await self._run(params, dispatch, on_error)
         finally:
+            if dispatcher is not None:
+                await dispatcher.drain()
             await self.client.close()
+
+    async def _get_updates(self, params: dict) -> list:
+        updates = await self.client.call_async("getUpdates", offset=self.offset, **params)
+        return updates if isinstance(updates, list) else []
+
+    async def _fetch(self, params: dict) -> List[Event]:
+        throttle = self.throttle
+        updates = await self._get_updates(_poll_params(params, throttle))
+        events, self.offset = _normalize(updates, self.offset, self.dedup)
+        return events if throttle is None else throttle.admit(events)
+
+    async def _run(self, params: dict, dispatch: Callable[[Event], Awaitable], on_error):
+        failures = 0
+        while True:
+            try:
+                events = await self._fetch(params)
+                failures = 0
+                await _dispatch_all_async(events, dispatch, on_error, "async polling loop")
+            except asyncio.CancelledError:
+                break
+            except TimeoutError:
+                continue
+            except Exception as e:
+                failures += 1
+                report_error(e, on_error, "async polling loop")
+                await asyncio.sleep(self.retry.wait(failures))
+
+    async def _run_pipelined(self, params: dict, dispatch: Callable[[Event], Awaitable], on_error, prefetch: int):
+        batches: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+        fetcher = asyncio.create_task(self._fetch_loop(params, batches, on_error))
+        try:
+            while True:
+                if fetcher.done():
+                    # The fetcher stopped (e.g. cancelled): finish the confirmed batches, then end like the plain loop.
+                    if batches.empty():
+                        break
+                    events = batches.get_nowait()
+                else:
+                    get = asyncio.ensure_future(batches.get())
+                    await asyncio.wait((get, fetcher), return_when=asyncio.FIRST_COMPLETED)
+                    if not get.done():
+                        get.cancel()
+                        continue
+                    events = get.result()
+                await _dispatch_all_async(events, dispatch, on_error, "async polling loop")
+        except asyncio.CancelledError:
+            pass
+        finally:
+            fetcher.cancel()
+            await asyncio.gather(fetcher, return_exceptions=True)
+
+    async def _fetch_loop(self, params: dict, batches: asyncio.Queue, on_error):
+        """Fetcher task: long-polls continuously, advancing the offset as soon as a batch arrives."""
+        failures = 0
+        while True:
+            try:
+                events = await self._fetch(params)
+            except TimeoutError:
+                continue
+            except Exception as e:
+                failures += 1
+                report_error(e, on_error, "async polling loop")
+                await asyncio.sleep(self.retry.wait(failures))
+                continue
+            failures = 0
+            if events:
+                await batches.put(events)
@@ -0,0 +1,278 @@
+"""Conversation state per (chat_id, user_id): in-memory LRU with TTL, optional write-behind persistence."""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from . import codec
+from .events import Event
+from .utils import report_error, reset_after_fork
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+Key = Tuple[int, int]
+# (state, data, expires_at); expires_at is wall-clock time so it survives restarts, 0 means never.
+Entry = Tuple[str, dict, float]
+# Cached "no state" for a key the backend doesn't have, so stateless users cost no load per update.
+_ABSENT: Entry = ("", {}, 0.0)
+
+
+class SQLiteStateBackend:
+    """States in an SQLite table; shared by processes using the same file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._inherited = []
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS states ("
+            "chat_id INTEGER, user_id INTEGER, state TEXT NOT NULL, data BLOB, expires_at REAL, "
+            "PRIMARY KEY (chat_id, user_id))"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+        reset_after_fork(self)
+
+    def _reset_after_fork(self):
+        # An SQLite connection must not be used across fork; closing it here would roll back the
+        # parent's transaction, so it is only kept from being garbage collected.
+        self._inherited.append(self._db)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def load(self, key: Key) -> Optional[Entry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state, data, expires_at FROM states WHERE chat_id = ? AND user_id = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], codec.loads(row[1]), row[2]
+
+    def save(self, changes: Dict[Key, Optional[Entry]]):
+        """Write changed entries (None deletes) in one transaction."""
+        upserts = [(*key, e[0], codec.dumps(e[1]), e[2]) for key, e in changes.items() if e is not None]
+        deletes = [key for key, e in changes.items() if e is None]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?, ?)", upserts)
+            self._db.executemany("DELETE FROM states WHERE chat_id = ? AND user_id = ?", deletes)
+
+    def close(self):
+        self._db.close()
+
+    def __reduce__(self):
+        return SQLiteStateBackend, (self.path,)
+
+
+class FileStateBackend:
+    """States in one JSON file, loaded at start and rewritten atomically on each flush; for small bots.
+
+    A flush re-reads the file under an exclusive lock on path + ".lock" and writes only its own
+    changes over it, so processes sharing the file (webhook workers) don't erase each other's states.
+    The lock is advisory (fcntl), so on Windows the file is for a single process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[Key, Entry] = self._read()
+        self._lock = threading.Lock()
+        reset_after_fork(self)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[Key, Entry]:
+        try:
+            with open(self.path, "rb") as f:
+                rows = codec.loads(f.read())
+        except FileNotFoundError:
+            rows = []
+        return {(r[0], r[1]): (r[2], r[3], r[4]) for r in rows}
+
+    def load(self, key: Key) -> Optional[Entry]:
+        return self._entries.get(key)
+
+    def save(self, changes: Dict[Key, Optional[Entry]]):
+        with self._lock, open(f"{self.path}.lock", "wb") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = self._read()
+            for key, entry in changes.items():
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+            rows = [[*key, *entry] for key, entry in entries.items()]
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(codec.dumps(rows))
+            os.replace(tmp, self.path)
+            self._entries = entries
+
+    def close(self):
+        pass
+
+    def __reduce__(self):
+        return FileStateBackend, (self.path,)
+
+
+class StateStore:
+    """Conversation state and data per (chat_id, user_id) of an Event.
+
+    Reads are served from an in-memory LRU of max_size entries; a state expires ttl seconds after
+    it was set. With a backend (an SQLiteStateBackend or FileStateBackend, or a path ending in
+    .json / anything else for SQLite), changes are written behind every flush_interval seconds by a
+    background thread and on close(), and entries missing from memory are loaded from it (a miss is
+    remembered too, so users without a state don't cost a query per update). Without one, least
+    recently used states beyond max_size are forgotten.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 100_000,
+        ttl: Optional[float] = None,
+        backend=None,
+        flush_interval: float = 1.0,
+    ):
+        if isinstance(backend, (str, os.PathLike)):
+            path = os.fspath(backend)
+            backend = FileStateBackend(path) if path.endswith(".json") else SQLiteStateBackend(path)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[Key, Entry]" = OrderedDict()
+        self._dirty: Dict[Key, Optional[Entry]] = {}
+        self._flushing: Dict[Key, Optional[Entry]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        reset_after_fork(self)
+
+    def _reset_after_fork(self):
+        # A forked webhook worker starts with an empty cache and its own flush thread; the parent
+        # writes its own pending changes.
+        self._entries = OrderedDict()
+        self._dirty = {}
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+
+    @staticmethod
+    def key(event: Event) -> Key:
+        return (event.chat_id, event.user_id)
+
+    def _entry(self, key: Key) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif key in self._dirty or key in self._flushing:
+                # Evicted or deleted, and not written to the backend yet.
+                entry = self._dirty[key] if key in self._dirty else self._flushing[key]
+            elif self.backend is not None:
+                entry = self.backend.load(key)
+                self._remember(key, _ABSENT if entry is None else entry)
+            if entry is None or entry is _ABSENT:
+                return None
+            if entry[2] and entry[2] <= time.time():
+                self._write(key, None)
+                return None
+            return entry
+
+    def _remember(self, key: Key, entry: Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            # Unflushed changes stay in _dirty, so eviction never loses a write.
+            self._entries.popitem(last=False)
+
+    def _write(self, key: Key, entry: Optional[Entry]):
+        if self.backend is not None:
+            self._remember(key, _ABSENT if entry is None else entry)
+            self._dirty[key] = entry
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="shingram-state-flush", daemon=True)
+                self._flusher.start()
+        elif entry is None:
+            self._entries.pop(key, None)
+        else:
+            self._remember(key, entry)
+
+    def get(self, event: Event) -> Optional[str]:
+        """Current state of the event's chat and user, or None."""
+        entry = self._entry(self.key(event))
+        return entry[0] if entry is not None else None
+
+    def data(self, event: Event) -> dict:
+        """Data stored with the current state (a copy; change it with set() or update())."""
+        entry = self._entry(self.key(event))
+        return dict(entry[1]) if entry is not None else {}
+
+    def set(self, event: Event, state: Optional[str], data: Optional[dict] = None):
+        """Move to `state` with `data` (None clears the state and its data)."""
+        key = self.key(event)
+        expires_at = time.time() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._write(key, None if state is None else (state, dict(data or {}), expires_at))
+
+    def update(self, event: Event, **data):
+        """Add to the current state's data; does nothing without a state."""
+        entry = self._entry(self.key(event))
+        if entry is not None:
+            self.set(event, entry[0], {**entry[1], **data})
+
+    def clear(self, event: Event):
+        self.set(event, None)
+
+    def flush(self):
+        """Write pending changes to the backend now."""
+        if self.backend is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                changes = self._flushing = self._dirty
+                self._dirty = {}
+            if not changes:
+                return
+            try:
+                self.backend.save(changes)
+            except Exception:
+                with self._lock:
+                    # Keep them for the next flush, unless they were changed again meanwhile.
+                    self._dirty = {**changes, **self._dirty}
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def _flush_loop(self):
+        while not self._wake.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                report_error(e, None, "state flush")
+
+    def close(self):
+        """Flush pending changes and stop the flush thread."""
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        if self.backend is not None:
+            self.backend.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __reduce__(self):
+        # Webhook worker processes get their own cache over the same backend.
+        return StateStore, (self.max_size, self.ttl, self.backend, self.flush_interval)
@@ -0,0 +1,138 @@
+"""Inbound flood control: per-user token buckets applied to updates before they reach handlers."""
+
+import heapq
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
+from .events import Event
+from .ratelimit import TokenBucket
+
+_MODES = ("drop", "delay", "collapse")
+
+
+@dataclass(frozen=True)
+class ThrottleRule:
+    """rate events per second per user, bursts of up to burst; what happens to the excess: mode.
+
+    "drop" discards it, "delay" dispatches it once the user's bucket allows, "collapse" is like
+    delay but keeps only the user's latest excess event (e.g. repeated button presses).
+    """
+    rate: float = 1.0
+    burst: int = 5
+    mode: str = "drop"
+
+    def __post_init__(self):
+        if self.mode not in _MODES:
+            raise ValueError(f"mode must be one of {_MODES}, got {self.mode!r}")
+
+
+class Throttle:
+    """Per-user anti-flood filter for the polling runtimes: Runtime.run(throttle=Throttle(...)).
+
+    Events are keyed by user_id (chat_id when there is no user). rules maps event types to their
+    own ThrottleRule, or to None to leave that type alone; other types use default (None: not
+    throttled). At most max_users buckets are kept: full (idle) buckets are dropped first, then
+    the oldest. At most max_pending delayed events are held; beyond that excess is dropped.
+    on_drop(event) is called for every dropped event.
+    """
+
+    def __init__(
+        self,
+        default: Optional[ThrottleRule] = ThrottleRule(),
+        rules: Optional[Dict[str, Optional[ThrottleRule]]] = None,
+        max_users: int = 100_000,
+        max_pending: int = 10_000,
+        on_drop: Optional[Callable[[Event], None]] = None,
+    ):
+        self.default = default
+        self.rules = dict(rules or {})
+        self.max_users = max_users
+        self.max_pending = max_pending
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._buckets: Dict[tuple, TokenBucket] = {}
+        self._pending: List[list] = []  # heap of [due, seq, event]
+        self._collapsing: Dict[tuple, list] = {}
+        self._seq = 0
+
+    def _rule(self, event_type: str) -> Tuple[Optional[ThrottleRule], str]:
+        if event_type in self.rules:
+            return self.rules[event_type], event_type
+        return self.default, "*"
+
+    def _bucket(self, key: tuple, rule: ThrottleRule, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_users:
+                # Full buckets carry no state. If active users still fill 90%, forget the oldest,
+                # so a flood of new users costs one sweep per max_users / 10 of them.
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.idle(now)}
+                excess = len(self._buckets) - int(self.max_users * 0.9)
+                for old in list(islice(self._buckets, max(excess, 0))):
+                    del self._buckets[old]
+            bucket = self._buckets[key] = TokenBucket(rule.rate, rule.burst)
+        return bucket
+
+    def admit(self, events: List[Event], now: Optional[float] = None) -> List[Event]:
+        """Events to dispatch now: delayed ones that are due, then the allowed ones from `events`."""
+        now = time.monotonic() if now is None else now
+        # Due ones first: a user's newer events must not overtake their delayed ones.
+        admitted = self.release(now)
+        for event in events:
+            rule, scope = self._rule(event.type)
+            user = event.user_id or event.chat_id
+            if rule is None or not user:
+                admitted.append(event)
+                continue
+            key = (scope, user)
+            bucket = self._bucket(key, rule, now)
+            ready = bucket.ready_at(now)
+            if ready <= now:
+                bucket.take(now)
+                admitted.append(event)
+            elif rule.mode == "drop":
+                self._drop(event)
+            elif rule.mode == "collapse" and key in self._collapsing:
+                slot = self._collapsing[key]
+                self._drop(slot[2])
+                slot[2] = event
+            elif len(self._pending) >= self.max_pending:
+                self._drop(event)
+            else:
+                bucket.take(ready)
+                self._seq += 1
+                slot = [ready, self._seq, event]
+                heapq.heappush(self._pending, slot)
+                if rule.mode == "collapse":
+                    self._collapsing[key] = slot
+        return admitted
+
+    def release(self, now: Optional[float] = None) -> List[Event]:
+        """Delayed events whose time has come, oldest first."""
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._pending and self._pending[0][0] <= now:
+            slot = heapq.heappop(self._pending)
+            event = slot[2]
+            key = (self._rule(event.type)[1], event.user_id or event.chat_id)
+            if self._collapsing.get(key) is slot:
+                del self._collapsing[key]
+            due.append(event)
+        return due
+
+    def next_due(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the next delayed event is due, or None if none are held."""
+        if not self._pending:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._pending[0][0] - now)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _drop(self, event: Event):
+        self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop(event)
@@ -1,9 +1,20 @@
 """Utility functions for shingram."""
 
+import os
+import weakref
+from functools import lru_cache
+from typing import Callable, Optional
 
+# Objects holding connections that must not be shared with a forked child (webhook worker processes).
+_FORK_RESET: "weakref.WeakSet" = weakref.WeakSet()
+
+
+@lru_cache(maxsize=1024)
 def snake_to_camel(name: str) -> str:
     """Convert snake_case to camelCase.
     
+    Results are cached (LRU, 1024 names), since this runs for every proxied API call.
+    
     Args:
         name: String in snake_case format
         
@@ -18,3 +29,36 @@ def snake_to_camel(name: str) -> str:
     """
     parts = name.split('_')
     return parts[0] + ''.join(word.capitalize() for word in parts[1:])
+
+
+def report_error(error: BaseException, on_error: Optional[Callable[[BaseException], None]], where: str):
+    """Pass an error to the user's on_error callback, or print it when there is none.
+
+    Args:
+        error: The exception raised in a handler, loop or background send
+        on_error: Optional callback taking the exception
+        where: Short description of where it happened, used in the printed message
+    """
+    if callable(on_error):
+        on_error(error)
+    else:
+        print(f"Error in {where}: {error}")
+
+
+
+def reset_after_fork(obj):
+    """Have obj._reset_after_fork() called in forked child processes while obj is alive.
+
+    Used by objects holding sockets or database connections: the child must open its own
+    instead of using (or closing) the parent's.
+    """
+    _FORK_RESET.add(obj)
+
+
+def _reset_in_child():
+    for obj in list(_FORK_RESET):
+        obj._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_in_child)
@@ -1,23 +1,140 @@
 """Webhook support for Shingram."""
 
-import json
-from typing import Callable, Optional
+import multiprocessing
+import threading
+import traceback
+from typing import Awaitable, Callable, Iterable, List, Optional, Union
+from . import codec
+from .dedup import UpdateDeduplicator
 from .router import Router
-from .events import normalize
+from .events import Event, normalize, normalize_batch, _ordering_key
+from .runtime import _TaskDispatcher
+
+
+def _process_worker(router: Router, events, initializer: Optional[Callable[[], None]]):
+    """Worker process loop; the router arrives pickled, so its dispatch plan is rebuilt here."""
+    if initializer is not None:
+        initializer()
+    try:
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            try:
+                router.dispatch(event)
+            except Exception:
+                traceback.print_exc()
+    finally:
+        # Write the states changed since the last background flush.
+        if router.states is not None:
+            router.states.close()
+
+
+class _ProcessDispatcher:
+    """Shared-nothing worker processes, one bounded queue each; events are sharded by chat."""
+
+    def __init__(
+        self,
+        router: Router,
+        processes: int,
+        queue_size: int,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
+        context = multiprocessing.get_context()
+        self._queues = [context.Queue(maxsize=queue_size) for _ in range(processes)]
+        self._processes = [
+            context.Process(
+                target=_process_worker, args=(router, q, initializer), name=f"shingram-webhook-{i}", daemon=True
+            )
+            for i, q in enumerate(self._queues)
+        ]
+        self._next = 0
+        for process in self._processes:
+            process.start()
+
+    def submit(self, event: Event):
+        key = _ordering_key(event)
+        if key is None:
+            self._next = index = (self._next + 1) % len(self._queues)
+        else:
+            index = hash(key) % len(self._queues)
+        # Blocks while the worker's queue is full.
+        self._queues[index].put(event)
+
+    def close(self):
+        """Let workers finish queued events, then stop them."""
+        for events in self._queues:
+            events.put(None)
+        for process in self._processes:
+            process.join()
 
 
 class WebhookServer:
     """Simple webhook server for receiving Telegram updates."""
     
-    def __init__(self, router: Router, secret_token: Optional[str] = None):
+    def __init__(
+        self,
+        router: Router,
+        secret_token: Optional[str] = None,
+        processes: Optional[int] = None,
+        queue_size: int = 100,
+        concurrency: int = 100,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        dedup: Optional[UpdateDeduplicator] = None,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
         """Initialize webhook server.
         
         Args:
             router: Event router to dispatch events to
             secret_token: Optional secret token for webhook validation
+            processes: Optional number of worker processes; updates are sharded to them
+                by chat_id, so each chat stays in order while handlers use all cores.
+                Workers start on the first update (or on start()) and get their own copy
+                of the router; shingram clients inherited by a forked worker drop the
+                parent's connections and open their own.
+            queue_size: Max queued updates per worker process before handle_update blocks
+            concurrency: Max handlers running in the background (async handling with
+                background=True); updates from the same chat still run in order
+            on_error: Optional callback for errors raised by background handlers
+            dedup: Optional UpdateDeduplicator; updates Telegram redelivers (same update_id)
+                are acknowledged without being dispatched again
+            initializer: Optional callable run once in each worker process before it
+                handles updates (e.g. to open database connections)
         """
         self.router = router
         self.secret_token = secret_token
+        self.processes = processes
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+        self.on_error = on_error
+        self.dedup = dedup
+        self.initializer = initializer
+        self._lock = threading.Lock()
+        self._dispatcher: Optional[_ProcessDispatcher] = None
+        self._background: Optional[_TaskDispatcher] = None
+    
+    def _authorized(self, headers: Optional[dict]) -> bool:
+        if not self.secret_token:
+            return True
+        if not headers:
+            return False
+        return headers.get("X-Telegram-Bot-Api-Secret-Token") == self.secret_token
+    
+    def _redelivered(self, update_json: dict) -> bool:
+        dedup = self.dedup
+        if dedup is None:
+            return False
+        update_id = update_json.get("update_id") if isinstance(update_json, dict) else None
+        return update_id is not None and dedup.seen(update_id)
+    
+    def _forget(self, events: List[Event]):
+        """Un-see updates whose dispatch failed, so Telegram's redelivery is handled."""
+        if self.dedup is not None:
+            for event in events:
+                update_id = event.raw.get("update_id")
+                if update_id is not None:
+                    self.dedup.forget(update_id)
     
     def handle_update(self, update_json: dict, headers: Optional[dict] = None) -> bool:
         """Handle a single update from webhook.
@@ -27,52 +144,176 @@ class WebhookServer:
             headers: Optional HTTP headers for validation
             
         Returns:
-            True if update was processed successfully
+            True if update was processed successfully (now, or before if it is a redelivery)
         """
-        # Validate secret token if provided
-        if self.secret_token:
-            if not headers:
-                return False
-            token_header = headers.get("X-Telegram-Bot-Api-Secret-Token")
-            if token_header != self.secret_token:
-                return False
+        if not self._authorized(headers):
+            return False
+        if self._redelivered(update_json):
+            return True
         
         # Normalize and dispatch
         event = normalize(update_json)
         if event:
-            self.router.dispatch(event)
+            try:
+                self._dispatch(event)
+            except BaseException:
+                self._forget([event])
+                raise
             return True
         
         return False
     
-    def handle_request(self, request_body: str, headers: Optional[dict] = None) -> bool:
+    def handle_updates(self, updates: Iterable[dict], headers: Optional[dict] = None) -> int:
+        """Handle many updates at once (bulk ingestion, replaying stored updates).
+        
+        Args:
+            updates: Update JSON objects, e.g. a getUpdates page
+            headers: Optional HTTP headers for validation
+            
+        Returns:
+            Number of events dispatched
+        """
+        if not self._authorized(headers):
+            return 0
+        if self.dedup is not None:
+            updates = self.dedup.filter(updates)
+        events, _ = normalize_batch(updates)
+        for i, event in enumerate(events):
+            try:
+                self._dispatch(event)
+            except BaseException:
+                self._forget(events[i:])
+                raise
+        return len(events)
+    
+    def start(self):
+        """Start the worker processes now (e.g. before serving) instead of on the first update."""
+        with self._lock:
+            if self.processes and self._dispatcher is None:
+                self._dispatcher = _ProcessDispatcher(self.router, self.processes, self.queue_size, self.initializer)
+            return self._dispatcher
+    
+    def _dispatch(self, event: Event):
+        if self.processes:
+            # One pool even when a threaded server's first requests arrive together.
+            (self._dispatcher or self.start()).submit(event)
+        else:
+            self.router.dispatch(event)
+    
+    def handle_request(self, request_body: Union[str, bytes], headers: Optional[dict] = None) -> bool:
         """Handle HTTP request body.
         
         Args:
-            request_body: JSON string from HTTP request
+            request_body: JSON string or raw bytes from HTTP request
             headers: Optional HTTP headers
             
         Returns:
             True if request was processed successfully
         """
         try:
-            update_json = json.loads(request_body)
-            return self.handle_update(update_json, headers)
-        except (json.JSONDecodeError, KeyError):
+            update_json = codec.loads(request_body)
+        except codec.DecodeError:
+            return False
+        return self.handle_update(update_json, headers)
+    
+    async def handle_update_async(
+        self,
+        update_json: dict,
+        headers: Optional[dict] = None,
+        background: bool = False,
+    ) -> bool:
+        """Handle a single update with Router.dispatch_async.
+        
+        Args:
+            update_json: Update JSON from Telegram
+            headers: Optional HTTP headers for validation
+            background: If True, return as soon as the update is scheduled so the
+                HTTP 200 goes out while handlers keep running (at most `concurrency`
+                at once; waits while 10 * concurrency updates are unfinished)
+            
+        Returns:
+            True if update was accepted
+        """
+        if not self._authorized(headers):
+            return False
+        if self._redelivered(update_json):
+            return True
+        
+        event = normalize(update_json)
+        if not event:
+            return False
+        if background:
+            if self._background is None:
+                self._background = _TaskDispatcher(self.router.dispatch_async, self.concurrency, self.on_error)
+            await self._background.submit(event)
+        else:
+            try:
+                await self.router.dispatch_async(event)
+            except BaseException:
+                self._forget([event])
+                raise
+        return True
+    
+    async def handle_request_async(
+        self,
+        request_body: Union[str, bytes],
+        headers: Optional[dict] = None,
+        background: bool = False,
+    ) -> bool:
+        """Async counterpart of handle_request; see handle_update_async for background.
+        
+        Args:
+            request_body: JSON string or raw bytes from HTTP request
+            headers: Optional HTTP headers
+            background: Return before handlers finish
+            
+        Returns:
+            True if request was accepted
+        """
+        try:
+            update_json = codec.loads(request_body)
+        except codec.DecodeError:
             return False
+        return await self.handle_update_async(update_json, headers, background)
+    
+    def close(self):
+        """Stop worker processes (if any) after they finish queued updates."""
+        with self._lock:
+            dispatcher, self._dispatcher = self._dispatcher, None
+        if dispatcher is not None:
+            dispatcher.close()
+    
+    async def close_async(self):
+        """Wait for background handlers, then stop worker processes (if any)."""
+        if self._background is not None:
+            await self._background.drain()
+            self._background = None
+        self.close()
 
 
-def create_webhook_handler(router: Router, secret_token: Optional[str] = None) -> Callable:
+def create_webhook_handler(
+    router: Router,
+    secret_token: Optional[str] = None,
+    processes: Optional[int] = None,
+    dedup: Optional[UpdateDeduplicator] = None,
+    initializer: Optional[Callable[[], None]] = None,
+) -> Callable:
     """Create a webhook handler function for use with web frameworks.
     
     Args:
         router: Event router
         secret_token: Optional secret token for validation
+        processes: Optional number of worker processes to dispatch in (see WebhookServer)
+        dedup: Optional UpdateDeduplicator to drop redelivered updates
+        initializer: Optional callable run once in each worker process (see WebhookServer)
         
     Returns:
-        Handler function that can be used with Flask, FastAPI, etc.
+        Handler function that can be used with Flask, FastAPI, etc. Its .server is the
+        WebhookServer; call handler.close() at shutdown so worker processes handle the
+        updates already queued (and answered) instead of being killed at exit.
         
     Example with Flask:
+        import atexit
         from flask import Flask, request
         from shingram import Bot
         from shingram.webhook import create_webhook_handler
@@ -84,12 +325,64 @@ def create_webhook_handler(router: Router, secret_token: Optional[str] = None) -
         
         @app.route('/webhook', methods=['POST'])
         def webhook():
-            handler(request.data.decode('utf-8'), dict(request.headers))
+            handler(request.data, dict(request.headers))
             return 'OK'
+        
+        atexit.register(handler.close)
     """
-    server = WebhookServer(router, secret_token)
+    server = WebhookServer(router, secret_token, processes, dedup=dedup, initializer=initializer)
     
     def handler(request_body: str, headers: Optional[dict] = None) -> bool:
         return server.handle_request(request_body, headers)
     
+    handler.server = server
+    handler.close = server.close
+    return handler
+
+
+def create_async_webhook_handler(
+    router: Router,
+    secret_token: Optional[str] = None,
+    background: bool = False,
+    concurrency: int = 100,
+    on_error: Optional[Callable[[BaseException], None]] = None,
+    dedup: Optional[UpdateDeduplicator] = None,
+) -> Callable[..., Awaitable[bool]]:
+    """Create an async webhook handler for ASGI frameworks (FastAPI, Starlette, ...).
+    
+    Args:
+        router: Event router; handlers may be sync or async
+        secret_token: Optional secret token for validation
+        background: If True, the handler returns once the update is scheduled and
+            handlers finish in the background
+        concurrency: Max background handlers in flight
+        on_error: Optional callback for errors raised by background handlers
+        dedup: Optional UpdateDeduplicator to drop redelivered updates
+        
+    Returns:
+        Async handler taking (body, headers); body may be raw bytes. Its .server is the
+        WebhookServer; await handler.close_async() on shutdown so background handlers finish.
+        
+    Example with FastAPI:
+        handler = bot.create_async_webhook_handler(background=True)
+        
+        @asynccontextmanager
+        async def lifespan(app):
+            yield
+            await handler.close_async()
+        
+        app = FastAPI(lifespan=lifespan)
+        
+        @app.post('/webhook')
+        async def webhook(request: Request):
+            await handler(await request.body(), request.headers)
+            return {"status": "ok"}
+    """
+    server = WebhookServer(router, secret_token, concurrency=concurrency, on_error=on_error, dedup=dedup)
+    
+    async def handler(request_body: Union[str, bytes], headers: Optional[dict] = None) -> bool:
+        return await server.handle_request_async(request_body, headers, background)
+    
+    handler.server = server
+    handler.close_async = server.close_async
     return handler
@@ -0,0 +1,75 @@
+"""Tests for broadcast (httpx mock transport, no network)."""
+
+import asyncio
+import httpx
+import pytest
+from shingram import codec
+from shingram.client import Client, AsyncClient
+
+
+def _handler(sent):
+    def handler(request):
+        body = codec.loads(request.content)
+        sent.append(body["chat_id"])
+        if body["chat_id"] == 2:
+            error = {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            return httpx.Response(403, content=codec.dumps(error))
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": {"chat": {"id": body["chat_id"]}}}))
+    return handler
+
+
+def test_broadcast_results():
+    sent = []
+    client = Client("TOKEN")
+    client._client = httpx.Client(transport=httpx.MockTransport(_handler(sent)))
+    
+    results = {r.chat_id: r for r in client.broadcast([1, 2, 3], text="digest", concurrency=2)}
+    assert sorted(sent) == [1, 2, 3]
+    assert results[1].ok and results[1].result == {"chat": {"id": 1}}
+    assert not results[2].ok and results[2].error.error_code == 403
+
+
+def test_broadcast_resume(tmp_path):
+    checkpoint = str(tmp_path / "digest.done")
+    sent = []
+    client = Client("TOKEN")
+    client._client = httpx.Client(transport=httpx.MockTransport(_handler(sent)))
+    
+    results = client.broadcast(range(1, 6), text="digest", concurrency=1, checkpoint=checkpoint)
+    next(results)
+    next(results)
+    results.close()
+    
+    sent.clear()
+    list(client.broadcast(range(1, 6), text="digest", concurrency=1, checkpoint=checkpoint))
+    assert sent == [3, 4, 5]
+
+
+def test_checkpoint_skips_only_final_outcomes(tmp_path):
+    from shingram.broadcast import BroadcastResult, _Checkpoint
+    from shingram.exceptions import TelegramAPIError
+
+    checkpoint = _Checkpoint(str(tmp_path / "digest.done"))
+    checkpoint.record(BroadcastResult(1, result={}))
+    checkpoint.record(BroadcastResult(2, error=TelegramAPIError(403, "Forbidden")))
+    checkpoint.record(BroadcastResult(3, error=TelegramAPIError(400, "Bad Request: chat not found")))
+    checkpoint.record(BroadcastResult(4, error=TelegramAPIError(429, "Too Many Requests")))
+    checkpoint.record(BroadcastResult(5, error=TelegramAPIError(502, "Bad Gateway")))
+    checkpoint.record(BroadcastResult(6, error=httpx.ConnectError("down")))
+    checkpoint.close()
+    resumed = _Checkpoint(str(tmp_path / "digest.done"))
+    assert resumed.done == {"1", "2", "3"}
+    resumed.close()
+
+
+def test_broadcast_async():
+    sent = []
+    client = AsyncClient("TOKEN")
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(_handler(sent)))
+    
+    async def run():
+        return [r async for r in client.broadcast([1, 2, 3], text="digest", concurrency=2)]
+    
+    results = asyncio.run(run())
+    assert sorted(r.chat_id for r in results) == [1, 2, 3]
+    assert [r.chat_id for r in results if not r.ok] == [2]
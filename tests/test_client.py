@@ -0,0 +1,311 @@
+"""Tests for the API clients (httpx mock transport, no network)."""
+
+import asyncio
+import io
+import httpx
+import pytest
+from shingram import codec
+from shingram.client import Client, AsyncClient, HTTPOptions, RetryPolicy
+from shingram.exceptions import TelegramAPIError
+from shingram.files import InputFile
+
+
+def _client(handler):
+    client = Client("TOKEN")
+    client._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return client
+
+
+def _async_client(handler):
+    client = AsyncClient("TOKEN")
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_codec_roundtrip_bytes():
+    data = {"chat_id": 1, "text": "héllo ✓"}
+    encoded = codec.dumps(data)
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == data
+    with pytest.raises(codec.DecodeError):
+        codec.loads(b"\xff not json")
+
+
+def test_call():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": {"message_id": 5}}))
+
+    client = _client(handler)
+    assert client.send_message(chat_id=1, text="hi") == {"message_id": 5}
+    assert requests[0].url.path == "/botTOKEN/sendMessage"
+    assert requests[0].headers["content-type"] == "application/json"
+    assert codec.loads(requests[0].content) == {"chat_id": 1, "text": "hi"}
+
+
+def test_call_error():
+    def handler(request):
+        return httpx.Response(400, content=codec.dumps({"ok": False, "error_code": 400, "description": "Bad Request"}))
+
+    client = _client(handler)
+    with pytest.raises(TelegramAPIError) as exc:
+        client.call("sendMessage", chat_id=1)
+    assert exc.value.error_code == 400
+    assert exc.value.method == "sendMessage"
+
+
+def test_call_async():
+    def handler(request):
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": True}))
+
+    async def run():
+        client = _async_client(handler)
+        try:
+            return await client.delete_webhook()
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) is True
+
+
+def test_long_poll_uses_own_pool_and_timeout():
+    seen = {}
+
+    def poll_handler(request):
+        seen["poll"] = request.extensions["timeout"]
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": []}))
+
+    def send_handler(request):
+        seen["send"] = request.extensions["timeout"]
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": {}}))
+
+    client = Client("TOKEN", http=HTTPOptions(connect_timeout=2.0, read_timeout=5.0))
+    client._client = httpx.Client(transport=httpx.MockTransport(send_handler), timeout=client.http.timeout())
+    client._poll_client = httpx.Client(transport=httpx.MockTransport(poll_handler))
+    
+    assert client.get_updates(offset=0, timeout=25) == []
+    client.send_message(chat_id=1, text="hi")
+    assert seen["poll"]["read"] == 30.0
+    assert seen["poll"]["connect"] == 2.0
+    assert seen["send"]["read"] == 5.0
+
+
+def test_http_options_limits():
+    kwargs = HTTPOptions(max_connections=50, keepalive_expiry=60.0).client_kwargs()
+    assert kwargs["limits"].max_connections == 50
+    assert kwargs["limits"].keepalive_expiry == 60.0
+    assert HTTPOptions().client_kwargs(poll=True)["limits"].max_connections == 2
+
+
+def test_method_proxy_cached():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": {}}))
+
+    client = _client(handler)
+    assert client.send_message is client.send_message
+    assert "send_message" in vars(client)
+    client.send_message(chat_id=1, text="a")
+    client.get_chat_member_count(chat_id=1)
+    assert calls == ["/botTOKEN/sendMessage", "/botTOKEN/getChatMemberCount"]
+
+
+def test_snake_to_camel_cached():
+    from shingram.utils import snake_to_camel
+    assert snake_to_camel("send_media_group") == "sendMediaGroup"
+    hits = snake_to_camel.cache_info().hits
+    assert snake_to_camel("send_media_group") == "sendMediaGroup"
+    assert snake_to_camel.cache_info().hits == hits + 1
+
+
+def _photo_result(request):
+    return httpx.Response(200, content=codec.dumps({"ok": True, "result": {"photo": [{"file_id": "small"}, {"file_id": "big"}]}}))
+
+
+def test_upload_path_multipart_then_cached(tmp_path):
+    photo = tmp_path / "cat.jpg"
+    photo.write_bytes(b"\xff\xd8 jpeg bytes")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return _photo_result(request)
+
+    client = _client(handler)
+    client.send_photo(chat_id=1, photo=photo, caption="hi", reply_markup={"inline_keyboard": []})
+    body = requests[0].read()
+    assert requests[0].headers["content-type"].startswith("multipart/form-data")
+    assert b'filename="cat.jpg"' in body
+    assert b"\xff\xd8 jpeg bytes" in body
+    assert b'{"inline_keyboard":[]}' in body
+
+    client.send_photo(chat_id=2, photo=InputFile(str(photo)))
+    assert requests[1].headers["content-type"] == "application/json"
+    assert codec.loads(requests[1].content) == {"chat_id": 2, "photo": "big"}
+
+
+def test_file_ids_cached_per_parameter(tmp_path):
+    path = tmp_path / "cat.jpg"
+    path.write_bytes(b"jpeg")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        name = "photo" if request.url.path.endswith("sendPhoto") else "document"
+        if request.headers["content-type"] == "application/json":
+            assert codec.loads(request.content)[name] == f"{name}-id"
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": {name: {"file_id": f"{name}-id"}}}))
+
+    client = _client(handler)
+    for _ in range(2):
+        client.send_photo(chat_id=1, photo=path)
+        client.send_document(chat_id=1, document=path)
+    kinds = [r.headers["content-type"].split(";")[0] for r in requests]
+    assert kinds == ["multipart/form-data"] * 2 + ["application/json"] * 2
+
+
+def test_upload_stream_async():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return _photo_result(request)
+
+    async def run():
+        client = _async_client(handler)
+        stream = io.BytesIO(b"data")
+        await client.send_photo(chat_id=1, photo=InputFile(stream, filename="a.png", cache_key="logo"))
+        await client.send_photo(chat_id=1, photo=InputFile(stream, filename="a.png", cache_key="logo"))
+        await client.close()
+        return stream
+
+    stream = asyncio.run(run())
+    assert not stream.closed
+    assert len(requests) == 2
+    assert b"data" in requests[0].read()
+    assert codec.loads(requests[1].content)["photo"] == "big"
+
+
+def test_stale_file_id_uploads_again():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.headers["content-type"] == "application/json":
+            return httpx.Response(400, content=codec.dumps({"ok": False, "error_code": 400, "description": "Bad Request: wrong file identifier"}))
+        return _photo_result(request)
+
+    client = _client(handler)
+    client.file_ids.set("photo:logo", "expired")
+    client.send_photo(chat_id=1, photo=InputFile(io.BytesIO(b"data"), cache_key="logo"))
+    assert len(requests) == 2
+    assert requests[1].headers["content-type"].startswith("multipart/form-data")
+    assert client.file_ids.get("photo:logo") == "big"
+
+
+def _file_handler(content, status=200):
+    def handler(request):
+        if request.url.path == "/botTOKEN/getFile":
+            assert codec.loads(request.content) == {"file_id": "F1"}
+            return httpx.Response(200, content=codec.dumps({"ok": True, "result": {"file_path": "voice/file_1.oga"}}))
+        assert request.url.path == "/file/botTOKEN/voice/file_1.oga"
+        return httpx.Response(status, content=content)
+
+    return handler
+
+
+def test_download_file(tmp_path):
+    client = _client(_file_handler(b"x" * 100_000))
+    dest = tmp_path / "voice.oga"
+    assert client.download_file("F1", dest) == dest
+    assert dest.read_bytes() == b"x" * 100_000
+    assert [len(c) for c in client.iter_file("F1", chunk_size=40_000)] == [40_000, 40_000, 20_000]
+
+
+def test_download_file_error_removes_partial(tmp_path):
+    client = _client(_file_handler(codec.dumps({"ok": False, "error_code": 404, "description": "Not Found"}), status=404))
+    dest = tmp_path / "voice.oga"
+    with pytest.raises(TelegramAPIError) as exc:
+        client.download_file("F1", dest)
+    assert exc.value.error_code == 404
+    assert not dest.exists()
+
+
+def test_download_file_async():
+    async def run():
+        client = _async_client(_file_handler(b"abc" * 1000))
+        buffer = io.BytesIO()
+        await client.download_file("F1", buffer)
+        chunks = [c async for c in client.iter_file("F1", chunk_size=1000)]
+        await client.close()
+        return buffer.getvalue(), chunks
+
+    data, chunks = asyncio.run(run())
+    assert data == b"abc" * 1000
+    assert b"".join(chunks) == data and max(map(len, chunks)) <= 1000
+
+
+def _flaky(failures, error):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) <= failures:
+            if isinstance(error, int):
+                return httpx.Response(error, content=codec.dumps({"ok": False, "error_code": error, "description": "Bad Gateway"}))
+            raise error
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": {"id": 1}}))
+
+    return handler, requests
+
+
+def test_retry_idempotent_on_5xx():
+    handler, requests = _flaky(2, 502)
+    client = _client(handler)
+    client.retry = RetryPolicy(base_delay=0)
+    assert client.get_me() == {"id": 1}
+    assert len(requests) == 3
+
+
+def test_no_retry_for_send_that_may_have_arrived():
+    handler, requests = _flaky(1, 502)
+    client = _client(handler)
+    client.retry = RetryPolicy(base_delay=0)
+    with pytest.raises(TelegramAPIError) as exc:
+        client.send_message(chat_id=1, text="hi")
+    assert exc.value.error_code == 502
+    assert len(requests) == 1
+
+
+def test_retry_send_that_never_left():
+    handler, requests = _flaky(1, httpx.ConnectError("refused"))
+    client = _client(handler)
+    client.retry = RetryPolicy(base_delay=0)
+    assert client.send_message(chat_id=1, text="hi") == {"id": 1}
+    assert len(requests) == 2
+
+
+def test_circuit_breaker_fails_fast():
+    handler, requests = _flaky(10, httpx.ConnectError("refused"))
+    client = _client(handler)
+    client.retry = RetryPolicy(max_retries=0, failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(TelegramAPIError) as exc:
+            client.get_me()
+        assert exc.value.error_code == "HTTP_ERROR"
+    with pytest.raises(TelegramAPIError) as exc:
+        client.get_me()
+    assert exc.value.error_code == "CIRCUIT_OPEN"
+    assert len(requests) == 2
+    assert client.retry.wait(1) > 59
+
+
+def test_backoff_grows_and_is_capped():
+    policy = RetryPolicy(base_delay=1, max_delay=8)
+    for attempt, cap in [(0, 1), (1, 2), (2, 4), (5, 8)]:
+        assert cap / 2 <= policy.backoff(attempt) <= cap
+
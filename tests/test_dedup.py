@@ -0,0 +1,82 @@
+"""Tests for redelivered-update suppression."""
+
+from shingram.dedup import UpdateDeduplicator
+
+
+def test_seen_within_window():
+    dedup = UpdateDeduplicator(window=60)
+    assert not dedup.seen(1, now=100.0)
+    assert dedup.seen(1, now=130.0)
+    assert not dedup.seen(2, now=170.0)  # expires 1
+    assert not dedup.seen(1, now=170.0)
+    assert dedup.dropped == 1
+
+
+def test_bounded_size():
+    dedup = UpdateDeduplicator(max_size=3, window=None)
+    for update_id in range(5):
+        assert not dedup.seen(update_id, now=0.0)
+    assert len(dedup) == 3
+    assert dedup.seen(4, now=0.0)
+    assert not dedup.seen(0, now=0.0)
+
+
+def test_filter_keeps_order_and_updates_without_id():
+    dedup = UpdateDeduplicator()
+    updates = [{"update_id": 1}, {"update_id": 2}, {"update_id": 1}, {"message": {}}]
+    assert dedup.filter(updates) == [{"update_id": 1}, {"update_id": 2}, {"message": {}}]
+    assert dedup.filter([{"update_id": 2}, {"update_id": 3}]) == [{"update_id": 3}]
+
+
+def test_shared_store(tmp_path):
+    path = tmp_path / "seen.db"
+    first = UpdateDeduplicator(store=path)
+    second = UpdateDeduplicator(store=str(path))
+    assert not first.seen(7)
+    assert second.seen(7)
+    assert not second.seen(8)
+    assert first.seen(8)
+    first.close()
+    second.close()
+
+    restarted = UpdateDeduplicator(store=path)
+    assert restarted.seen(7)
+    restarted.close()
+
+
+def test_store_prune(tmp_path):
+    dedup = UpdateDeduplicator(max_size=2, window=10, store=tmp_path / "seen.db")
+    dedup.store.add(1, 0.0)
+    dedup.store.add(2, 95.0)
+    dedup.store.add(3, 96.0)
+    dedup.store.add(4, 97.0)
+    dedup.store.prune(before=90.0, keep=2)
+    assert [r[0] for r in dedup.store._db.execute("SELECT update_id FROM seen_updates ORDER BY update_id")] == [3, 4]
+    dedup.close()
+
+
+def test_forget(tmp_path):
+    dedup = UpdateDeduplicator(max_size=2, store=tmp_path / "seen.db")
+    assert not dedup.seen(1, now=0.0)
+    dedup.forget(1)
+    assert not dedup.seen(1, now=1.0)
+    assert dedup.seen(1, now=2.0)
+    assert not dedup.seen(2, now=3.0)
+    assert not dedup.seen(3, now=4.0)  # the size bound evicts 1
+    assert len(dedup) == 2
+    dedup.close()
+
+
+def test_check_and_record(tmp_path):
+    dedup = UpdateDeduplicator(store=tmp_path / "seen.db")
+    updates = [{"update_id": 1}, {"update_id": 2}]
+    assert dedup.filter(updates, record=False) == updates
+    assert not dedup.check(1)
+    dedup.record(1)
+    assert dedup.filter(updates, record=False) == [{"update_id": 2}]
+    assert dedup.dropped == 1
+    dedup.close()
+
+    restarted = UpdateDeduplicator(store=tmp_path / "seen.db")
+    assert restarted.check(1) and not restarted.check(2)
+    restarted.close()
@@ -1,7 +1,8 @@
 """Tests for event normalization."""
 
+import pickle
 import pytest
-from shingram.events import Event, normalize
+from shingram.events import Event, normalize, normalize_batch
 
 
 def test_normalize_command():
@@ -134,3 +135,168 @@ def test_normalize_unsupported():
     
     event = normalize(update)
     assert event is None
+
+
+def test_normalize_non_object():
+    for update in ([], "x", 1, None):
+        assert normalize(update) is None
+    assert normalize_batch([[], {"update_id": 3, "poll": {"id": "p1"}}]) == ([normalize({"update_id": 3, "poll": {"id": "p1"}})], 4)
+
+
+def test_dataclasses_functions():
+    import dataclasses
+
+    update = {"update_id": 1, "message": {"message_id": 5, "from": {"id": 7, "username": "ann"}, "chat": {"id": 7, "type": "private"}, "text": "hi"}}
+    event = normalize(update)
+    assert [f.name for f in dataclasses.fields(event)] == list(dataclasses.asdict(event))
+    copy = dataclasses.replace(event, text="HI")
+    assert copy.text == "HI" and copy.username == "ann" and copy.chat_type == "private"
+    assert dataclasses.asdict(copy)["username"] == "ann"
+    assert event.text == "hi"
+
+
+def test_normalize_callback():
+    update = {
+        "update_id": 1,
+        "callback_query": {
+            "id": "cb1",
+            "from": {"id": 123, "first_name": "Test", "username": "tester"},
+            "message": {
+                "message_id": 7,
+                "chat": {"id": 456, "type": "private"},
+                "text": "Pick one"
+            },
+            "data": "vote:yes"
+        }
+    }
+    
+    event = normalize(update)
+    assert event is not None
+    assert event.type == "callback"
+    assert event.name == "vote"
+    assert event.text == "vote:yes"
+    assert event.callback_query_id == "cb1"
+    assert event.message_id == 7
+    assert event.reply_to == 7
+    assert event.username == "tester"
+
+
+def test_normalize_channel_post_command():
+    update = {
+        "update_id": 1,
+        "channel_post": {
+            "message_id": 3,
+            "chat": {"id": -100, "type": "channel", "title": "News"},
+            "text": "/digest@mybot today"
+        }
+    }
+    
+    event = normalize(update)
+    assert event is not None
+    assert event.type == "command"
+    assert event.name == "digest"
+    assert event.user_id == 0
+    assert event.chat_title == "News"
+    assert event.username is None
+
+
+def test_normalize_removed_chat_boost():
+    update = {
+        "update_id": 1,
+        "removed_chat_boost": {
+            "chat": {"id": -100, "type": "channel", "title": "News"},
+            "boost_id": "b1"
+        }
+    }
+    
+    event = normalize(update)
+    assert event is not None
+    assert event.type == "removed_chat_boost"
+    assert event.chat_id == -100
+    assert event.chat_type == "channel"
+    assert event.user_id == 0
+
+
+def test_event_lazy_fields():
+    update = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "from": {"id": 123, "first_name": "Test", "language_code": "en"},
+            "chat": {"id": 456, "type": "group", "title": "Group"},
+            "photo": [{"file_id": "x"}],
+            "date": 1234567890
+        }
+    }
+    
+    event = normalize(update)
+    assert not hasattr(event, "__dict__")
+    assert event.first_name == "Test"
+    assert event.language_code == "en"
+    assert event.username is None
+    assert event.chat_title == "Group"
+    assert event.content_type == "photo"
+    
+    event.username = "override"
+    assert event.username == "override"
+    assert update["message"]["from"].get("username") is None
+
+
+def test_event_equality():
+    update = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "from": {"id": 123, "first_name": "Test"},
+            "chat": {"id": 456, "type": "private"},
+            "text": "Hello",
+        }
+    }
+    
+    expected = Event(
+        type="message",
+        name="",
+        chat_id=456,
+        user_id=123,
+        text="Hello",
+        raw=update,
+        chat_type="private",
+        message_id=1,
+        first_name="Test",
+        content_type="text",
+    )
+    assert normalize(update) == expected
+    assert "first_name='Test'" in repr(expected)
+
+
+def test_event_pickle():
+    update = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "from": {"id": 123, "first_name": "Test"},
+            "chat": {"id": 456, "type": "private"},
+            "text": "Hello",
+        }
+    }
+    
+    event = normalize(update)
+    restored = pickle.loads(pickle.dumps(event))
+    assert restored == event
+    assert restored.first_name == "Test"
+    assert restored.username is None
+
+
+def test_normalize_batch():
+    updates = [
+        {"update_id": 10, "message": {"message_id": 1, "from": {"id": 1}, "chat": {"id": 2}, "text": "/start"}},
+        {"update_id": 11, "unknown_update_type": {}},
+        {"update_id": 12, "poll": {"id": "p1"}},
+    ]
+    
+    events, offset = normalize_batch(updates)
+    assert [e.type for e in events] == ["command", "poll"]
+    assert events == [normalize(u) for u in (updates[0], updates[2])]
+    assert offset == 13
+    
+    assert normalize_batch([], 7) == ([], 7)
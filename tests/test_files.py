@@ -0,0 +1,79 @@
+"""Tests for upload helpers and the file_id cache."""
+
+import io
+import os
+import pytest
+from shingram.files import FileIdCache, InputFile, find_uploads, form_fields
+
+
+def test_find_uploads_and_form_fields(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF")
+    params = {"chat_id": 1, "document": path, "caption": "x", "reply_markup": {"a": 1}}
+    uploads = find_uploads(params)
+    assert list(uploads) == ["document"]
+    assert uploads["document"].filename == "doc.pdf"
+    assert uploads["document"].content_type == "application/pdf"
+    assert form_fields(params, uploads) == {"chat_id": b"1", "caption": "x", "reply_markup": b'{"a":1}'}
+
+
+def test_lru_eviction():
+    cache = FileIdCache(max_size=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    cache.get("a")
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+
+def test_stream_keyed_by_content_hash():
+    cache = FileIdCache()
+    stream = io.BytesIO(b"same bytes")
+    stream.read(2)
+    key = cache.key_for(InputFile(stream))
+    assert stream.tell() == 2
+    assert key == cache.key_for(InputFile(io.BytesIO(b"same bytes")))
+    assert key.startswith("sha256:")
+
+
+def test_by_content_shares_id_between_copies(tmp_path):
+    a, b = tmp_path / "a.png", tmp_path / "b.png"
+    a.write_bytes(b"png")
+    b.write_bytes(b"png")
+    assert FileIdCache().key_for(InputFile(a)) != FileIdCache().key_for(InputFile(b))
+    assert FileIdCache(by_content=True).key_for(InputFile(a)) == FileIdCache(by_content=True).key_for(InputFile(b))
+    assert FileIdCache().key_for(InputFile(a), "photo") != FileIdCache().key_for(InputFile(a), "document")
+    assert FileIdCache().key_for(InputFile(a, cache_key=("logo", 1)), "photo") == ("photo", ("logo", 1))
+
+
+def test_sqlite_store_survives_restart(tmp_path):
+    db = str(tmp_path / "ids.db")
+    cache = FileIdCache(store=db)
+    cache.set("sha256:abc", "FILE1")
+    cache.close()
+    cache = FileIdCache(store=db)
+    assert len(cache) == 0
+    assert cache.get("sha256:abc") == "FILE1"
+    cache.discard("sha256:abc")
+    cache.close()
+    assert FileIdCache(store=db).get("sha256:abc") is None
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_sqlite_store_reopens_in_forked_child(tmp_path):
+    from shingram.files import SQLiteFileIdStore
+
+    store = SQLiteFileIdStore(str(tmp_path / "ids.db"))
+    inherited = store._db
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = store._db is not inherited
+        store.set("k", "child-id")
+        os.write(write, b"1" if ok else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b"1"
+    assert store._db is inherited and store.get("k") == "child-id"
+    store.close()
@@ -0,0 +1,132 @@
+"""Tests for the background send queues (fake clients, no network)."""
+
+import asyncio
+import random
+import threading
+import time
+import pytest
+from shingram.outbox import SendQueue, AsyncSendQueue
+
+
+class SlowClient:
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def call(self, method, **params):
+        time.sleep(random.random() / 1000)
+        if params.get("text") == "boom":
+            raise ValueError("boom")
+        with self.lock:
+            self.sent.append((method, params["chat_id"], params["text"]))
+        return {"text": params["text"]}
+
+    async def call_async(self, method, **params):
+        await asyncio.sleep(random.random() / 1000)
+        return self.call(method, **params)
+
+
+def test_send_queue_futures_and_order():
+    client = SlowClient()
+    errors = []
+    outbox = SendQueue(client, workers=3, on_error=errors.append)
+    futures = [outbox.send_message(chat_id=i % 4, text=str(i)) for i in range(40)]
+    failed = outbox.send_message(chat_id=1, text="boom")
+    outbox.close()
+    assert [f.result() for f in futures] == [{"text": str(i)} for i in range(40)]
+    with pytest.raises(ValueError):
+        failed.result()
+    assert len(errors) == 1
+    for chat in range(4):
+        texts = [int(t) for m, c, t in client.sent if c == chat]
+        assert texts == sorted(texts)
+    assert {m for m, c, t in client.sent} == {"sendMessage"}
+
+
+def test_send_queue_close_is_idempotent():
+    outbox = SendQueue(SlowClient())
+    outbox.close()
+    future = outbox.send_message(chat_id=1, text="after")
+    outbox.close()
+    assert future.result() == {"text": "after"}
+
+
+def test_async_send_queue_order_and_drain():
+    client = SlowClient()
+    errors = []
+
+    async def run():
+        outbox = AsyncSendQueue(client, concurrency=3, on_error=errors.append)
+        tasks = [outbox.send_message(chat_id=i % 3, text=str(i)) for i in range(30)]
+        outbox.send_message(chat_id=0, text="boom")
+        await outbox.drain()
+        assert outbox.pending == 0
+        return [t.result() for t in tasks]
+
+    assert asyncio.run(run()) == [{"text": str(i)} for i in range(30)]
+    assert len(errors) == 1
+    for chat in range(3):
+        texts = [int(t) for m, c, t in client.sent if c == chat]
+        assert texts == sorted(texts)
+
+
+class GatedClient:
+    """Records calls; the first call blocks until released, so later ones pile up in the queue."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+
+    def call(self, method, **params):
+        if not self.calls:
+            self.calls.append((method, params))
+            self.gate.wait(5)
+        else:
+            self.calls.append((method, params))
+        return len(self.calls)
+
+
+def test_pending_edits_collapse_to_latest():
+    client = GatedClient()
+    outbox = SendQueue(client, workers=1)
+    first = outbox.send_message(chat_id=1, text="working")
+    time.sleep(0.05)
+    edits = [outbox.edit_message_text(chat_id=1, message_id=7, text=f"{p}%") for p in range(10, 101, 10)]
+    other = outbox.edit_message_text(chat_id=1, message_id=8, text="other message")
+    client.gate.set()
+    outbox.close()
+    assert first.result() == 1
+    assert len({id(f) for f in edits}) == 1
+    assert client.calls[1] == ("editMessageText", {"chat_id": 1, "message_id": 7, "text": "100%"})
+    assert client.calls[2][1]["message_id"] == 8 and other.result() == 3
+    assert len(client.calls) == 3
+
+
+def test_merge_window_joins_small_sends():
+    client = SlowClient()
+    outbox = SendQueue(client, workers=2, merge_window=0.05)
+    a = outbox.send_message(chat_id=1, text="a")
+    b = outbox.send_message(chat_id=1, text="b")
+    outbox.send_message(chat_id=2, text="other chat")
+    outbox.send_photo(chat_id=1, photo="F", text="photo")
+    c = outbox.send_message(chat_id=1, text="c")
+    outbox.close()
+    assert a is b and a.result() == {"text": "a\nb"}
+    assert c.result() == {"text": "c"}
+    assert [(m, t) for m, ch, t in client.sent if ch == 1] == [("sendMessage", "a\nb"), ("sendPhoto", "photo"), ("sendMessage", "c")]
+
+
+def test_async_pending_edits_collapse():
+    client = SlowClient()
+
+    async def run():
+        outbox = AsyncSendQueue(client, concurrency=1)
+        outbox.send_message(chat_id=1, text="start")
+        tasks = [outbox.edit_message_text(chat_id=1, message_id=3, text=str(p)) for p in range(5)]
+        await outbox.drain()
+        return tasks
+
+    tasks = asyncio.run(run())
+    assert all(t is tasks[0] for t in tasks)
+    assert [t for m, c, t in client.sent] == ["start", "4"]
+
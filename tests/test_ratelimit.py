@@ -0,0 +1,68 @@
+"""Tests for the outbound rate limiter."""
+
+import asyncio
+import httpx
+import pytest
+from shingram import codec
+from shingram.client import Client, AsyncClient
+from shingram.exceptions import TelegramAPIError
+from shingram.ratelimit import RateLimiter, TokenBucket
+
+
+def test_token_bucket_burst():
+    bucket = TokenBucket(rate=2, burst=2)
+    now = 100.0
+    assert bucket.ready_at(now) <= now
+    bucket.take(now)
+    assert bucket.ready_at(now) <= now
+    bucket.take(now)
+    assert bucket.ready_at(now) == pytest.approx(now + 0.5)
+    assert not bucket.idle(now)
+    assert bucket.idle(now + 1.0)
+
+
+def test_reserve_per_chat():
+    limiter = RateLimiter(global_rate=1000, global_burst=1000, chat_rate=10, chat_burst=1, group_rate=5, group_burst=1)
+    assert limiter.reserve(1) == 0
+    assert limiter.reserve(2) == 0
+    assert limiter.reserve(1) == pytest.approx(0.1, abs=0.01)
+    assert limiter.reserve(-100) == 0
+    assert limiter.reserve(-100) == pytest.approx(0.2, abs=0.01)
+    assert limiter.queue_depth == 2
+
+
+def test_reserve_global():
+    limiter = RateLimiter(global_rate=10, global_burst=1)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_retry_after_429():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            body = {"ok": False, "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 0.01}}
+            return httpx.Response(429, content=codec.dumps(body))
+        return httpx.Response(200, content=codec.dumps({"ok": True, "result": {"message_id": 1}}))
+
+    limiter = RateLimiter()
+    client = Client("TOKEN", rate_limiter=limiter)
+    client._client = httpx.Client(transport=httpx.MockTransport(handler))
+    assert client.send_message(chat_id=1, text="hi") == {"message_id": 1}
+    assert len(calls) == 2
+    assert limiter.queue_depth == 0
+
+
+def test_retry_after_exhausted_async():
+    def handler(request):
+        body = {"ok": False, "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 0}}
+        return httpx.Response(429, content=codec.dumps(body))
+
+    client = AsyncClient("TOKEN", rate_limiter=RateLimiter(max_retries=1))
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with pytest.raises(TelegramAPIError) as exc:
+        asyncio.run(client.send_message(chat_id=1, text="hi"))
+    assert exc.value.error_code == 429
+    assert exc.value.retry_after == 0
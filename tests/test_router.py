@@ -1,6 +1,7 @@
 """Tests for router (sync and async dispatch)."""
 
 import asyncio
+import re
 import pytest
 from shingram.router import Router
 from shingram.events import Event
@@ -126,3 +127,207 @@ def test_dispatch_async():
     asyncio.run(run())
     assert len(called) == 1
     assert called[0] == event
+
+
+def test_dispatch_specific_overrides_type():
+    router = Router()
+    called = []
+    
+    router.on("*", lambda e: called.append("*"))
+    router.on("command", lambda e: called.append("command"))
+    router.on("command:start", lambda e: called.append("start"))
+    
+    router.dispatch(Event(type="command", name="start", chat_id=1, user_id=2, text="/start", raw={}))
+    router.dispatch(Event(type="command", name="help", chat_id=1, user_id=2, text="/help", raw={}))
+    assert called == ["*", "start", "*", "command"]
+
+
+def test_register_after_dispatch():
+    router = Router()
+    called = []
+    event = Event(type="message", name="", chat_id=1, user_id=2, text="Hi", raw={})
+    
+    router.dispatch(event)
+    router.on("message", lambda e: called.append(e))
+    router.dispatch(event)
+    assert called == [event]
+
+
+def test_dispatch_async_mixed_handlers():
+    router = Router()
+    called = []
+
+    async def async_handler(event):
+        called.append("async")
+
+    def sync_handler(event):
+        called.append("sync")
+
+    router.on("*", sync_handler)
+    router.on("callback:vote", async_handler)
+    event = Event(type="callback", name="vote", chat_id=1, user_id=2, text="vote:yes", raw={})
+
+    asyncio.run(router.dispatch_async(event))
+    assert called == ["sync", "async"]
+
+
+def _callback(data, chat_type="private"):
+    event = Event(type="callback", name=data.split(":")[0], chat_id=1, user_id=2, text=data, raw={})
+    event.chat_type = chat_type
+    return event
+
+
+def test_prefix_routes_take_precedence():
+    router = Router()
+    called = []
+    router.on("callback", lambda e: called.append("type"))
+    router.on("callback:page", lambda e: called.append("name"))
+    router.on("callback", lambda e: called.append("page"), prefix="page:")
+    router.on("callback", lambda e: called.append("page:1"), prefix="page:1")
+    router.on("*", lambda e: called.append("any-page"), prefix="page")
+
+    router.dispatch(_callback("page:12"))
+    assert called == ["any-page", "page", "page:1"]
+    called.clear()
+    router.dispatch(_callback("page:2"))
+    assert called == ["any-page", "page"]
+    called.clear()
+    router.dispatch(_callback("menu"))
+    assert called == ["type"]
+
+
+def test_regex_and_predicate_routes():
+    router = Router()
+    called = []
+    router.on("command", lambda e: called.append(("ref", e.name)), regex=r"ref_(\d+)$")
+    router.on("command:start", lambda e: called.append("private start"), predicate=lambda e: e.chat_type == "private")
+    router.on("command:start", lambda e: called.append("start"))
+
+    def command(name, chat_type):
+        event = Event(type="command", name=name, chat_id=1, user_id=2, text=f"/{name}", raw={})
+        event.chat_type = chat_type
+        return event
+
+    router.dispatch(command("ref_42", "private"))
+    router.dispatch(command("ref_x", "private"))
+    router.dispatch(command("start", "group"))
+    router.dispatch(command("start", "private"))
+    assert called == [("ref", "ref_42"), "start", "private start"]
+
+
+def test_verbose_regex_is_not_indexed_by_its_text():
+    import re
+
+    router = Router()
+    called = []
+    router.on("callback", lambda e: called.append(e.text), regex=re.compile(r"buy  # buy button", re.X))
+    router.on("callback", lambda e: called.append("inline"), regex=r"(?x) sell \s* \d+")
+    router.dispatch(_callback("buy"))
+    router.dispatch(_callback("sell 3"))
+    assert called == ["buy", "inline"]
+
+
+def test_only_candidates_are_checked():
+    router = Router()
+    checked = []
+
+    def predicate(name):
+        return lambda e: checked.append(name) or True
+
+    for i in range(300):
+        router.on("callback", lambda e: None, prefix=f"route{i}:", predicate=predicate(i))
+    router.dispatch(_callback("route7:x"))
+    assert checked == [7]
+
+
+def _is_private(event):
+    return event.chat_type == "private"
+
+
+def test_filtered_routes_async_and_pickle():
+    import pickle
+
+    router = Router()
+    called = []
+
+    async def handler(event):
+        called.append(event.text)
+
+    router.on("callback", handler, regex=re.compile("buy:"))
+    asyncio.run(router.dispatch_async(_callback("buy:1")))
+    assert called == ["buy:1"]
+
+    router = Router()
+    router.on("callback", print, prefix="buy:", predicate=_is_private)
+    copy = pickle.loads(pickle.dumps(router))
+    assert len(copy.routes) == 1
+    assert copy._index["callback"].matching(_callback("buy:1"))
+    assert not copy._index["callback"].matching(_callback("buy:1", chat_type="group"))
+
+
+def test_no_middleware_dispatch_is_plain():
+    router = Router()
+    assert router._dispatch == router._route
+    assert router._dispatch_async == router._route_async
+
+
+def test_dispatch_override_in_subclass():
+    class CountingRouter(Router):
+        def dispatch(self, event):
+            self.count = getattr(self, "count", 0) + 1
+            return super().dispatch(event)
+
+    router = CountingRouter()
+    seen = []
+    router.on("message", seen.append)
+    router.use(lambda event, call_next: call_next(event))
+    router.dispatch(Event(type="message", name="", chat_id=1, user_id=2, text="hi", raw={}))
+    assert router.count == 1 and len(seen) == 1
+
+
+def test_middleware_order_short_circuit_and_mutation():
+    router = Router()
+    log = []
+    router.on("message", lambda e: log.append(("handler", e.text)))
+
+    @router.use
+    def outer(event, call_next):
+        log.append("outer in")
+        call_next(event)
+        log.append("outer out")
+
+    @router.use
+    def block_spam(event, call_next):
+        if event.text == "spam":
+            return
+        event.text = event.text.upper()
+        call_next(event)
+
+    router.dispatch(Event(type="message", name="", chat_id=1, user_id=2, text="hi", raw={}))
+    router.dispatch(Event(type="message", name="", chat_id=1, user_id=2, text="spam", raw={}))
+    assert log == ["outer in", ("handler", "HI"), "outer out", "outer in", "outer out"]
+
+
+def test_middleware_async_mixed():
+    router = Router()
+    log = []
+
+    async def handler(event):
+        log.append("handler")
+
+    router.on("message", handler)
+
+    @router.use
+    async def timing(event, call_next):
+        log.append("timing in")
+        await call_next(event)
+        log.append("timing out")
+
+    @router.use
+    def sync_pass(event, call_next):
+        log.append("sync")
+        return call_next(event)
+
+    asyncio.run(router.dispatch_async(Event(type="message", name="", chat_id=1, user_id=2, text="x", raw={})))
+    assert log == ["timing in", "sync", "handler", "timing out"]
+
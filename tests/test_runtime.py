@@ -0,0 +1,271 @@
+"""Tests for long-polling runtimes (fake client, no network)."""
+
+import asyncio
+import time
+import pytest
+from shingram.router import Router
+from shingram.runtime import Runtime, AsyncRuntime
+
+
+def _message(update_id, chat_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "from": {"id": chat_id, "first_name": "Test"},
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        },
+    }
+
+
+class FakeClient:
+    """Serves the given batches from getUpdates, then stops the loop."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.offsets = []
+        self.closed = False
+
+    def call(self, method, **params):
+        assert method == "getUpdates"
+        self.offsets.append(params["offset"])
+        if not self.batches:
+            raise KeyboardInterrupt()
+        return self.batches.pop(0)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncClient:
+    """Serves the given batches from getUpdates, then stops the loop."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.offsets = []
+        self.closed = False
+
+    async def call_async(self, method, **params):
+        assert method == "getUpdates"
+        self.offsets.append(params["offset"])
+        if not self.batches:
+            raise asyncio.CancelledError()
+        return self.batches.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_async_runtime_sequential():
+    router = Router()
+    seen = []
+
+    @router.on("message")
+    async def handler(event):
+        seen.append(event.text)
+
+    client = FakeAsyncClient([[_message(1, 10, "a"), _message(2, 20, "b")]])
+    asyncio.run(AsyncRuntime(client, router).run_async())
+    assert seen == ["a", "b"]
+    assert client.offsets == [0, 3]
+    assert client.closed
+
+
+def test_async_runtime_concurrency_keeps_chat_order():
+    router = Router()
+    seen = []
+
+    @router.on("message")
+    async def handler(event):
+        if event.text == "slow":
+            await asyncio.sleep(0.05)
+        seen.append((event.chat_id, event.text))
+
+    client = FakeAsyncClient([[
+        _message(1, 10, "slow"),
+        _message(2, 10, "after slow"),
+        _message(3, 20, "fast"),
+    ]])
+    asyncio.run(AsyncRuntime(client, router).run_async(concurrency=4))
+    assert seen == [(20, "fast"), (10, "slow"), (10, "after slow")]
+
+
+def test_async_runtime_concurrency_reports_handler_errors():
+    router = Router()
+    errors = []
+
+    @router.on("message")
+    async def handler(event):
+        raise ValueError(event.text)
+
+    client = FakeAsyncClient([[_message(1, 10, "boom")]])
+    asyncio.run(AsyncRuntime(client, router).run_async(concurrency=2, on_error=errors.append))
+    assert [str(e) for e in errors] == ["boom"]
+
+
+def test_runtime_workers_keep_chat_order():
+    router = Router()
+    seen = []
+
+    @router.on("message")
+    def handler(event):
+        if event.text == "slow":
+            time.sleep(0.05)
+        seen.append((event.chat_id, event.text))
+
+    client = FakeClient([[
+        _message(1, 10, "slow"),
+        _message(2, 10, "after slow"),
+        _message(3, 21, "fast"),
+    ]])
+    Runtime(client, router).run(workers=2, queue_size=1)
+    assert seen == [(21, "fast"), (10, "slow"), (10, "after slow")]
+    assert client.offsets == [0, 4]
+    assert client.closed
+
+
+class IdleAfterBatchesClient(FakeClient):
+    """getUpdates runs on the fetcher thread here; after the batches it long-polls with no updates."""
+
+    def call(self, method, **params):
+        if self.batches:
+            return super().call(method, **params)
+        self.offsets.append(params["offset"])
+        time.sleep(0.01)
+        return []
+
+
+def test_runtime_prefetch():
+    router = Router()
+    seen = []
+
+    @router.on("message")
+    def handler(event):
+        seen.append(event.text)
+        if event.text == "c":
+            raise KeyboardInterrupt()
+
+    client = IdleAfterBatchesClient([[_message(1, 10, "a"), _message(2, 10, "b")], [_message(3, 10, "c")]])
+    Runtime(client, router).run(prefetch=2)
+    assert seen == ["a", "b", "c"]
+    assert client.offsets[:3] == [0, 3, 4]
+    assert client.closed
+
+
+def test_async_runtime_prefetch():
+    router = Router()
+    seen = []
+    router.on("message", lambda event: seen.append(event.text))
+
+    client = FakeAsyncClient([[_message(1, 10, "a"), _message(2, 10, "b")], [_message(3, 10, "c")]])
+    asyncio.run(AsyncRuntime(client, router).run_async(prefetch=1))
+    assert seen == ["a", "b", "c"]
+    assert client.offsets == [0, 3, 4]
+    assert client.closed
+
+
+def test_runtime_handler_error_keeps_batch():
+    router = Router()
+    seen = []
+    errors = []
+
+    @router.on("message")
+    def handler(event):
+        if event.text == "bad":
+            raise ValueError("bad")
+        seen.append(event.text)
+
+    client = FakeClient([[_message(1, 10, "bad"), _message(2, 10, "good")]])
+    Runtime(client, router).run(on_error=errors.append)
+    assert seen == ["good"]
+    assert [str(e) for e in errors] == ["bad"]
+    assert client.offsets == [0, 3]
+
+
+def test_runtime_throttle_drops_flood():
+    from shingram.throttle import Throttle, ThrottleRule
+
+    flood = [_message(i, 1, f"spam {i}") for i in range(1, 11)] + [_message(11, 2, "hello")]
+    client = FakeClient([flood])
+    router = Router()
+    seen = []
+    router.on("message", lambda e: seen.append((e.user_id, e.text)))
+    throttle = Throttle(ThrottleRule(rate=1, burst=2))
+    Runtime(client, router).run(throttle=throttle)
+    assert seen == [(1, "spam 1"), (1, "spam 2"), (2, "hello")]
+    assert throttle.dropped == 8
+    assert client.offsets == [0, 12]
+
+
+
+def test_runtime_dedup_skips_redelivered_updates():
+    from shingram.dedup import UpdateDeduplicator
+
+    dedup = UpdateDeduplicator()
+    dedup.seen(1)
+    dedup.seen(2)
+    # Handed the already-dispatched updates again (e.g. after a restart), then only those.
+    client = FakeClient([[_message(1, 10, "a"), _message(2, 10, "b"), _message(3, 10, "c")], [_message(2, 10, "b")]])
+    router = Router()
+    seen = []
+    router.on("message", lambda e: seen.append(e.text))
+    Runtime(client, router).run(dedup=dedup)
+    assert seen == ["c"]
+    assert client.offsets == [0, 4, 4]
+
+
+def test_task_dispatcher_busy_chat_does_not_stall_others():
+    from shingram.events import normalize
+    from shingram.runtime import _TaskDispatcher
+
+    router = Router()
+    done = []
+
+    @router.on("message")
+    async def handler(event):
+        if event.chat_id == 10:
+            await asyncio.sleep(0.02)
+        done.append(event.chat_id)
+
+    async def run():
+        dispatcher = _TaskDispatcher(router.dispatch_async, 5, None)
+        for i in range(20):
+            await dispatcher.submit(normalize(_message(i, 10, "busy")))
+        await dispatcher.submit(normalize(_message(20, 20, "other")))
+        await asyncio.sleep(0.01)
+        assert done == [20]
+        await dispatcher.drain()
+
+    asyncio.run(run())
+    assert len(done) == 21
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_runtime_dedup_restart_mid_batch(tmp_path, workers):
+    from shingram.dedup import UpdateDeduplicator
+
+    batch = [_message(i, 10, str(i)) for i in range(10, 15)]
+    store = str(tmp_path / "seen.db")
+    seen = []
+
+    def handler(event):
+        if event.text == "12" and "crash" not in seen:
+            seen.append("crash")
+            raise KeyboardInterrupt()
+        seen.append(event.text)
+
+    router = Router()
+    router.on("message", handler)
+    dedup = UpdateDeduplicator(store=store)
+    Runtime(FakeClient([batch]), router).run(dedup=dedup)
+    dedup.close()
+    assert seen == ["10", "11", "crash"]
+
+    # Restarted: Telegram hands out the unconfirmed batch again.
+    dedup = UpdateDeduplicator(store=store)
+    client = FakeClient([batch])
+    Runtime(client, router).run(dedup=dedup, workers=workers)
+    dedup.close()
+    assert seen == ["10", "11", "crash", "12", "13", "14"]
+    assert client.offsets == [0, 15]
@@ -0,0 +1,133 @@
+"""Tests for the conversation state store and state routing."""
+
+import os
+import pickle
+import time
+import pytest
+from shingram.events import Event
+from shingram.router import Router
+from shingram.state import StateStore
+
+
+def _message(chat_id=1, user_id=2, text="hi"):
+    return Event(type="message", name="", chat_id=chat_id, user_id=user_id, text=text, raw={})
+
+
+def test_set_get_update_clear():
+    store = StateStore()
+    event = _message()
+    assert store.get(event) is None and store.data(event) == {}
+    store.set(event, "ask_name", {"step": 1})
+    store.update(event, name="Ann")
+    assert store.get(event) == "ask_name"
+    assert store.data(event) == {"step": 1, "name": "Ann"}
+    assert store.get(_message(user_id=3)) is None
+    store.clear(event)
+    assert store.get(event) is None
+
+
+def test_ttl_and_lru_bound():
+    store = StateStore(max_size=2, ttl=0.05)
+    for user in range(3):
+        store.set(_message(user_id=user), "s")
+    assert len(store) == 2
+    assert store.get(_message(user_id=0)) is None
+    time.sleep(0.06)
+    assert store.get(_message(user_id=2)) is None
+
+
+@pytest.mark.parametrize("filename", ["states.db", "states.json"])
+def test_write_behind_backend(tmp_path, filename):
+    path = str(tmp_path / filename)
+    store = StateStore(max_size=1, backend=path, flush_interval=60)
+    store.set(_message(user_id=1), "a", {"n": 1})
+    store.set(_message(user_id=2), "b")
+    assert store.get(_message(user_id=1)) == "a"  # evicted, served from the pending writes
+    store.clear(_message(user_id=2))
+    store.close()
+
+    store = StateStore(backend=path)
+    assert store.get(_message(user_id=1)) == "a"
+    assert store.data(_message(user_id=1)) == {"n": 1}
+    assert store.get(_message(user_id=2)) is None
+    store.close()
+
+
+def test_backend_misses_are_cached(tmp_path):
+    from shingram.state import SQLiteStateBackend
+
+    class CountingBackend(SQLiteStateBackend):
+        loads = 0
+
+        def load(self, key):
+            CountingBackend.loads += 1
+            return super().load(key)
+
+    store = StateStore(backend=CountingBackend(str(tmp_path / "states.db")), flush_interval=60)
+    stateless = _message(user_id=1)
+    for _ in range(100):
+        assert store.get(stateless) is None
+    assert CountingBackend.loads == 1
+    store.set(stateless, "a")
+    assert store.get(stateless) == "a"
+    store.clear(stateless)
+    assert store.get(stateless) is None
+    assert CountingBackend.loads == 1
+    store.close()
+
+
+def test_file_backends_sharing_a_path_keep_each_others_states(tmp_path):
+    from shingram.state import FileStateBackend
+
+    path = str(tmp_path / "states.json")
+    first, second = FileStateBackend(path), FileStateBackend(path)
+    first.save({(1, 1): ("a", {}, 0.0)})
+    second.save({(1, 2): ("b", {}, 0.0)})
+    first.save({(1, 3): ("c", {}, 0.0)})
+    assert set(FileStateBackend(path)._entries) == {(1, 1), (1, 2), (1, 3)}
+    second.save({(1, 1): None})
+    assert set(FileStateBackend(path)._entries) == {(1, 2), (1, 3)}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_sqlite_backend_reopens_connection(tmp_path):
+    from shingram.state import SQLiteStateBackend
+
+    backend = SQLiteStateBackend(str(tmp_path / "states.db"))
+    inherited = backend._db
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = backend._db is not inherited
+        backend.save({(1, 2): ("child", {}, 0.0)})
+        os.write(write, b"1" if ok else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b"1"
+    assert backend._db is inherited
+    assert backend.load((1, 2))[0] == "child"
+    backend.close()
+
+
+def test_state_routes():
+    router = Router()
+    called = []
+    router.on("message", lambda e: called.append("plain"))
+    router.on("message", lambda e: called.append(("name", e.text)), state="ask_name")
+    router.on("command:cancel", lambda e: called.append("cancel"), state="ask_name")
+
+    event = _message(text="Ann")
+    router.dispatch(event)
+    router.states.set(event, "ask_name")
+    router.dispatch(event)
+    router.dispatch(_message(user_id=9))
+    assert called == ["plain", ("name", "Ann"), "plain"]
+
+
+def test_router_with_state_backend_pickles(tmp_path):
+    router = Router(StateStore(backend=str(tmp_path / "s.db")))
+    router.on("message", print, state="x")
+    router.states.set(_message(), "x")
+    router.states.flush()
+    copy = pickle.loads(pickle.dumps(router))
+    assert copy.states.get(_message()) == "x"
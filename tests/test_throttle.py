@@ -0,0 +1,56 @@
+"""Tests for inbound flood control."""
+
+import pytest
+from shingram.events import Event
+from shingram.runtime import _poll_params
+from shingram.throttle import Throttle, ThrottleRule
+
+
+def _event(user_id, text="x", type="message"):
+    return Event(type=type, name="", chat_id=user_id, user_id=user_id, text=text, raw={})
+
+
+def test_drop_excess_per_user():
+    dropped = []
+    throttle = Throttle(ThrottleRule(rate=1, burst=2), on_drop=dropped.append)
+    events = [_event(1, str(i)) for i in range(5)] + [_event(2)]
+    admitted = throttle.admit(events, now=100.0)
+    assert [(e.user_id, e.text) for e in admitted] == [(1, "0"), (1, "1"), (2, "x")]
+    assert len(dropped) == 3 and throttle.dropped == 3
+    assert [e.text for e in throttle.admit([_event(1, "later")], now=101.0)] == ["later"]
+
+
+def test_delay_releases_in_order():
+    throttle = Throttle(ThrottleRule(rate=2, burst=1, mode="delay"))
+    assert [e.text for e in throttle.admit([_event(1, "a"), _event(1, "b"), _event(1, "c")], now=10.0)] == ["a"]
+    assert throttle.pending == 2
+    assert throttle.next_due(now=10.0) == pytest.approx(0.5)
+    assert [e.text for e in throttle.admit([_event(1, "d")], now=10.6)] == ["b"]
+    assert [e.text for e in throttle.release(now=12.0)] == ["c", "d"]
+
+
+def test_collapse_keeps_latest_and_rules_per_type():
+    throttle = Throttle(
+        default=None,
+        rules={"callback": ThrottleRule(rate=1, burst=1, mode="collapse")},
+    )
+    events = [_event(1, str(i), type="callback") for i in range(4)] + [_event(1, "msg")] * 3
+    admitted = throttle.admit(events, now=0.0)
+    assert [e.text for e in admitted] == ["0", "msg", "msg", "msg"]
+    assert throttle.dropped == 2
+    assert [e.text for e in throttle.release(now=1.0)] == ["3"]
+
+
+def test_memory_bounded():
+    throttle = Throttle(ThrottleRule(rate=0.001, burst=1), max_users=100)
+    for user in range(1, 10_001):
+        throttle.admit([_event(user)], now=0.0)
+    assert len(throttle._buckets) <= 100
+
+
+def test_poll_timeout_shortened_for_delayed_events():
+    throttle = Throttle(ThrottleRule(rate=0.5, burst=1, mode="delay"))
+    params = {"timeout": 30, "limit": 100}
+    assert _poll_params(params, throttle) is params
+    throttle.admit([_event(1), _event(1)])
+    assert _poll_params(params, throttle)["timeout"] == 2
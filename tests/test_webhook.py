@@ -0,0 +1,288 @@
+"""Tests for webhook handling."""
+
+import asyncio
+import json
+import os
+import pytest
+from shingram.router import Router
+from shingram.webhook import WebhookServer, create_webhook_handler, create_async_webhook_handler
+
+
+def _message(update_id, chat_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "from": {"id": chat_id, "first_name": "Test"},
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        },
+    }
+
+
+class Recorder:
+    """Picklable handler that appends "pid chat_id text" lines to a file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        with open(self.path, "a") as f:
+            f.write(f"{os.getpid()} {event.chat_id} {event.text}\n")
+
+
+def test_handle_request():
+    router = Router()
+    seen = []
+    router.on("message", seen.append)
+    handler = create_webhook_handler(router)
+    
+    assert handler(json.dumps(_message(1, 10, "hi")))
+    assert not handler("not json")
+    assert not handler(b"[]")
+    assert not handler(b'"x"')
+    assert [e.text for e in seen] == ["hi"]
+
+
+def test_secret_token():
+    router = Router()
+    server = WebhookServer(router, secret_token="s3cret")
+    
+    assert not server.handle_update(_message(1, 10, "hi"))
+    assert not server.handle_update(_message(1, 10, "hi"), {"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+    assert server.handle_update(_message(1, 10, "hi"), {"X-Telegram-Bot-Api-Secret-Token": "s3cret"})
+
+
+def test_handle_updates():
+    router = Router()
+    seen = []
+    router.on("message", seen.append)
+    server = WebhookServer(router)
+    
+    updates = [_message(1, 10, "a"), {"update_id": 2, "unknown": {}}, _message(3, 20, "b")]
+    assert server.handle_updates(updates) == 2
+    assert [e.text for e in seen] == ["a", "b"]
+
+
+def test_process_dispatch_keeps_chat_order(tmp_path):
+    path = tmp_path / "events.txt"
+    router = Router()
+    router.on("message", Recorder(str(path)))
+    server = WebhookServer(router, processes=2)
+    
+    for update_id, (chat_id, text) in enumerate([(10, "a"), (21, "x"), (10, "b"), (10, "c")]):
+        assert server.handle_update(_message(update_id, chat_id, text))
+    server.close()
+    
+    lines = [line.split() for line in path.read_text().splitlines()]
+    assert [text for pid, chat, text in lines if chat == "10"] == ["a", "b", "c"]
+    assert len({pid for pid, chat, text in lines if chat == "10"}) == 1
+    assert all(pid != str(os.getpid()) for pid, chat, text in lines)
+
+
+def test_handler_close_drains_worker_processes(tmp_path):
+    path = tmp_path / "events.txt"
+    router = Router()
+    router.on("message", Recorder(str(path)))
+    handler = create_webhook_handler(router, processes=1)
+    
+    for update_id in range(3):
+        assert handler(json.dumps(_message(update_id, 10, str(update_id))))
+    handler.close()
+    
+    assert handler.server._dispatcher is None
+    assert [line.split()[2] for line in path.read_text().splitlines()] == ["0", "1", "2"]
+
+
+def test_worker_exit_flushes_states(tmp_path):
+    from shingram.events import normalize
+    from shingram.state import StateStore
+
+    path = str(tmp_path / "states.db")
+    states = StateStore(backend=path, flush_interval=60)
+    router = Router(states=states)
+    router.on("message", lambda event: states.set(event, event.text))
+    server = WebhookServer(router, processes=1)
+    server.handle_update(_message(1, 10, "waiting"))
+    server.close()
+
+    reopened = StateStore(backend=path)
+    assert reopened.get(normalize(_message(2, 10, "x"))) == "waiting"
+    reopened.close()
+    states.close()
+
+
+def _write_pid_file():
+    with open(os.environ["SHINGRAM_TEST_INIT"], "a") as f:
+        f.write(f"{os.getpid()}\n")
+
+
+def test_worker_initializer(tmp_path, monkeypatch):
+    init_path = tmp_path / "init.txt"
+    monkeypatch.setenv("SHINGRAM_TEST_INIT", str(init_path))
+    router = Router()
+    router.on("message", Recorder(str(tmp_path / "events.txt")))
+    server = WebhookServer(router, processes=2, initializer=_write_pid_file)
+    server.start()
+    server.handle_update(_message(1, 10, "a"))
+    server.close()
+    pids = init_path.read_text().split()
+    assert len(pids) == 2 and str(os.getpid()) not in pids
+
+
+def test_concurrent_first_updates_start_one_pool(monkeypatch):
+    import threading
+    import time
+    from shingram import webhook
+
+    pools = []
+
+    class FakePool:
+        def __init__(self, *args):
+            time.sleep(0.05)
+            pools.append(self)
+
+        def submit(self, event):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(webhook, "_ProcessDispatcher", FakePool)
+    server = WebhookServer(Router(), processes=2)
+    threads = [threading.Thread(target=server.handle_update, args=(_message(i, i, "x"),)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(pools) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_gets_fresh_connections():
+    from shingram.client import Client, AsyncClient
+
+    client, async_client = Client("TOKEN"), AsyncClient("TOKEN")
+    inherited = client._client
+    async_client._poll_client = "inherited"
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = client._client is not inherited and async_client._poll_client is None
+        os.write(write, b"1" if ok else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b"1"
+    assert client._client is inherited
+    async_client._poll_client = None
+    client.close()
+
+
+def test_async_handler_bytes():
+    router = Router()
+    seen = []
+
+    @router.on("message")
+    async def handler(event):
+        seen.append(event.text)
+
+    webhook = create_async_webhook_handler(router)
+
+    async def run():
+        assert await webhook(json.dumps(_message(1, 10, "hi")).encode())
+        assert not await webhook(b"\xff not json")
+
+    asyncio.run(run())
+    assert seen == ["hi"]
+
+
+def test_async_handler_background():
+    router = Router()
+    seen = []
+    release = []
+
+    @router.on("message")
+    async def handler(event):
+        while not release:
+            await asyncio.sleep(0)
+        seen.append(event.text)
+
+    server = WebhookServer(router)
+
+    async def run():
+        assert await server.handle_request_async(json.dumps(_message(1, 10, "a")), background=True)
+        assert await server.handle_request_async(json.dumps(_message(2, 10, "b")), background=True)
+        assert seen == []
+        release.append(True)
+        await server.close_async()
+
+    asyncio.run(run())
+    assert seen == ["a", "b"]
+
+
+def test_dedup_drops_redelivery():
+    from shingram.dedup import UpdateDeduplicator
+
+    router = Router()
+    seen = []
+    router.on("message", seen.append)
+    server = WebhookServer(router, dedup=UpdateDeduplicator())
+
+    assert server.handle_update(_message(1, 10, "a"))
+    assert server.handle_update(_message(1, 10, "a"))  # redelivered: acknowledged, not dispatched
+    assert server.handle_updates([_message(1, 10, "a"), _message(2, 10, "b")]) == 1
+    assert asyncio.run(server.handle_request_async(json.dumps(_message(2, 10, "b"))))
+    assert [e.text for e in seen] == ["a", "b"]
+
+
+def test_handle_request_handler_errors_propagate():
+    router = Router()
+
+    @router.on("message")
+    def handler(event):
+        raise ValueError("handler bug")
+
+    server = WebhookServer(router)
+    with pytest.raises(ValueError, match="handler bug"):
+        server.handle_request(json.dumps(_message(1, 10, "hi")))
+
+
+def test_dedup_redelivers_after_handler_error():
+    from shingram.dedup import UpdateDeduplicator
+
+    router = Router()
+    seen = []
+
+    @router.on("message")
+    def handler(event):
+        if not seen:
+            seen.append("failed")
+            raise RuntimeError("temporary")
+        seen.append(event.text)
+
+    server = WebhookServer(router, dedup=UpdateDeduplicator())
+    with pytest.raises(RuntimeError):
+        server.handle_update(_message(1, 10, "a"))
+    assert server.handle_update(_message(1, 10, "a"))  # Telegram retries after the 500
+    assert server.handle_update(_message(1, 10, "a"))
+    assert seen == ["failed", "a"]
+
+
+def test_async_handler_close_async_drains_background():
+    router = Router()
+    seen = []
+
+    @router.on("message")
+    async def handler(event):
+        await asyncio.sleep(0.01)
+        seen.append(event.text)
+
+    webhook = create_async_webhook_handler(router, background=True)
+
+    async def run():
+        assert await webhook(json.dumps(_message(1, 10, "a")))
+        assert seen == []
+        await webhook.close_async()
+        assert seen == ["a"]
+
+    asyncio.run(run())